@@ -6,6 +6,107 @@ from qwen_agent.tools.base import BaseTool, register_tool
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 import os
+import logging
+import atexit
+import threading
+import concurrent.futures
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson은 선택 사항
+    _json_loads = json.loads
+
+MCP_CONNECT_TIMEOUT_SEC = 30
+
+log = logging.getLogger("schedule_query_tool")
+
+# 모든 MCP 클라이언트가 공유하는 이벤트 루프 (호출마다 asyncio.run으로 루프를 만들지 않는다)
+_TOOL_LOOP = asyncio.new_event_loop()
+_TOOL_THREAD = threading.Thread(target=_TOOL_LOOP.run_forever, name="mcp-client-loop", daemon=True)
+_TOOL_THREAD.start()
+
+
+class _McpClientPool:
+    """server_path -> (session, stop, serve_future) 캐시.
+
+    stdio_client/ClientSession 컨텍스트를 _TOOL_LOOP 위에서 계속 열어두고,
+    call_tool()은 그 루프에 코루틴만 던지고 결과를 기다린다.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._clients = {}
+        self._lock = threading.Lock()
+        atexit.register(self.close_all)
+
+    def _connect(self, server_path: str):
+        ready = concurrent.futures.Future()
+
+        async def _serve():
+            # 컨텍스트 진입/종료가 같은 태스크에서 일어나야 해서 세션 전체를 이 코루틴이 쥐고 있는다
+            params = StdioServerParameters(command="python", args=[server_path])
+            async with stdio_client(params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    stop = asyncio.Event()
+                    ready.set_result((session, stop))
+                    await stop.wait()
+
+        def _on_done(fut):
+            if not ready.done():
+                exc = fut.exception() if not fut.cancelled() else None
+                ready.set_exception(exc or RuntimeError("MCP 서버 연결이 종료되었습니다"))
+
+        log.info("📡 MCP 쿼리 서버 연결 중... (%s)", server_path)
+        serve_future = asyncio.run_coroutine_threadsafe(_serve(), self._loop)
+        serve_future.add_done_callback(_on_done)
+        try:
+            session, stop = ready.result(timeout=MCP_CONNECT_TIMEOUT_SEC)
+        except Exception:
+            serve_future.cancel()
+            raise
+        log.info("✅ MCP 서버 연결 및 세션 초기화 완료")
+        return session, stop, serve_future
+
+    def _get(self, server_path: str):
+        with self._lock:
+            client = self._clients.get(server_path)
+            if client is None or client[2].done():
+                client = self._connect(server_path)
+                self._clients[server_path] = client
+            return client
+
+    def call_tool(self, server_path: str, name: str, arguments: dict):
+        session = self._get(server_path)[0]
+        try:
+            return asyncio.run_coroutine_threadsafe(session.call_tool(name, arguments=arguments), self._loop).result()
+        except Exception:
+            # 세션이 깨졌을 수 있으니 버리고 다음 호출에서 다시 연결
+            self._close(server_path)
+            raise
+
+    def _close(self, server_path: str):
+        with self._lock:
+            client = self._clients.pop(server_path, None)
+        if client is None:
+            return
+        _, stop, serve_future = client
+        if not serve_future.done():
+            self._loop.call_soon_threadsafe(stop.set)
+            try:
+                serve_future.result(timeout=5)
+            except Exception:
+                serve_future.cancel()
+
+    def close_all(self):
+        for server_path in list(self._clients):
+            self._close(server_path)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_MCP_POOL = _McpClientPool(_TOOL_LOOP)
+
 
 @register_tool('schedule_query')
 class ScheduleQueryTool(BaseTool):
@@ -19,51 +120,102 @@ class ScheduleQueryTool(BaseTool):
         {'name':'anchor_now','type':'string','description':'ISO8601 기준시각(옵션)','required':False},
     ]
 
-    async def _call_mcp_server(self, payload: dict):
+    def _call_mcp_server(self, payload: dict):
         server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule_query.py")
-        params = StdioServerParameters(command="python", args=[server_path])
         try:
-            print("  📡 MCP 쿼리 서버 연결 중...")
-            async with stdio_client(params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    print("  ✅ MCP 서버 연결 성공")
-                    await session.initialize()
-                    print("  ✅ 세션 초기화 완료")
-                    print("  🔎 조회 요청 payload=", json.dumps(payload, ensure_ascii=False))
-                    result = await session.call_tool("schedule_query", arguments=payload)
-                    print("  ✅ 조회 완료")
-                    if hasattr(result, 'content') and result.content:
-                        for item in result.content:
-                            if hasattr(item, 'text'):
-                                return item.text
-                    return str(result)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("🔎 조회 요청 payload=%s", json.dumps(payload, ensure_ascii=False))
+            result = _MCP_POOL.call_tool(server_path, "schedule_query", payload)
+            log.debug("✅ 조회 완료")
+            if hasattr(result, 'content') and result.content:
+                for item in result.content:
+                    if hasattr(item, 'text'):
+                        return item.text
+            return str(result)
         except Exception as e:
-            print(f"  ❌ MCP 서버 오류: {e}")
-            import traceback; traceback.print_exc()
+            log.error("❌ MCP 서버 오류: %s", e, exc_info=True)
             return f"MCP 서버 오류: {e}"
 
     def call(self, params, **kwargs) -> str:
-        if isinstance(params, str):
+        # qwen-agent는 보통 dict를 넘기므로 dict를 먼저 확인하고, 문자열일 때만 파싱한다
+        if isinstance(params, dict):
+            payload = params
+        elif isinstance(params, (str, bytes)):
             try:
-                payload = json.loads(params)
+                payload = _json_loads(params)
             except Exception:
                 return "❌ JSON 파싱 실패"
-        elif isinstance(params, dict):
-            payload = params
+            if not isinstance(payload, dict):
+                return "❌ 입력은 dict 또는 JSON 문자열이어야 합니다"
         else:
             return "❌ 입력은 dict 또는 JSON 문자열이어야 합니다"
 
         if not payload.get('intent') or not isinstance(payload.get('range'), dict):
             return "❌ intent와 range가 필요합니다"
 
+        return self._call_mcp_server(payload)
+
+
+def _stream_reply(agent, user_input: str, stop: threading.Event):
+    """agent.run 스트림을 받는 대로 출력한다 (응답 청크를 리스트에 쌓아두지 않음).
+    stop이 설정되면 다음 청크에서 바로 멈춘다 (Ctrl+C)."""
+    conversation_history = [{'role':'user','content': user_input}]
+    printed = []   # 메시지 index -> 이미 출력한 content 길이
+    current = None
+    for response in agent.run(conversation_history):
+        if stop.is_set():
+            return
+        if isinstance(response, dict):
+            response = [response]
+        for i, item in enumerate(response):
+            content = item.get('content') if isinstance(item, dict) else None
+            if not isinstance(content, str) or not content:
+                continue
+            while len(printed) <= i:
+                printed.append(0)
+            if len(content) <= printed[i]:
+                continue
+            if i != current:
+                if current is not None:
+                    print("\n")
+                print("🤖 Assistant: ", end="")
+                current = i
+            print(content[printed[i]:], end="", flush=True)
+            printed[i] = len(content)
+    if current is not None:
+        print("\n")
+
+
+def _start_reply(loop, agent, user_input: str, stop: threading.Event) -> asyncio.Future:
+    """_stream_reply를 데몬 스레드에서 실행하고 끝나면 완료되는 future를 돌려준다.
+    기본 executor를 쓰면 종료 시 asyncio.run이 워커를 join해서 Ctrl+C가 응답이 끝날 때까지 막힌다."""
+    fut = loop.create_future()
+
+    def _finish(exc):
+        if fut.done():
+            return
+        if exc is None:
+            fut.set_result(None)
+        else:
+            fut.set_exception(exc)
+
+    def _target():
+        exc = None
+        try:
+            _stream_reply(agent, user_input, stop)
+        except Exception as e:
+            exc = e
         try:
-            return asyncio.run(self._call_mcp_server(payload))
+            loop.call_soon_threadsafe(_finish, exc)
         except RuntimeError:
-            loop = asyncio.get_event_loop()
-            return loop.run_until_complete(self._call_mcp_server(payload))
+            pass  # 루프가 이미 닫힘 (Ctrl+C로 종료 중)
 
+    threading.Thread(target=_target, name="repl-reply", daemon=True).start()
+    return fut
 
-def main():
+
+async def main_async():
+    logging.basicConfig(level=logging.INFO, format="  %(message)s")
     print("\n" + "="*60)
     print("📅 일정 조회 AI 어시스턴트 (단일 툴: schedule_query)")
     print("   Qwen Agent + Schedule Query MCP Server")
@@ -106,34 +258,53 @@ NEVER invent other fields. Keep it minimal.
     print("💬 대화를 시작하세요 (종료: 'quit' 또는 Ctrl+C)")
     print("="*60 + "\n")
 
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue(maxsize=1)
+    prompt_ready = threading.Event()
+
+    def _read_stdin():
+        # input()은 데몬 스레드에서 블로킹하고, 한 턴이 끝나야 다음 프롬프트를 띄운다
+        while True:
+            prompt_ready.wait()
+            prompt_ready.clear()
+            try:
+                line = input("👤 You: ")
+            except EOFError:
+                line = None
+            asyncio.run_coroutine_threadsafe(inbox.put(line), loop).result()
+            if line is None:
+                return
+
+    threading.Thread(target=_read_stdin, name="repl-stdin", daemon=True).start()
+
     while True:
-        try:
-            user_input = input("👤 You: ").strip()
-            if not user_input:
-                continue
-            if user_input.lower() in ['quit','exit','종료']:
-                print("\n👋 프로그램을 종료합니다.\n")
-                break
-            conversation_history = [{'role':'user','content': user_input}]
-            responses = []
-            for response in agent.run(conversation_history):
-                responses.append(response)
-            if responses:
-                last = responses[-1]
-                if isinstance(last, list):
-                    for item in last:
-                        if isinstance(item, dict) and item.get('content'):
-                            print(f"🤖 Assistant: {item['content']}\n")
-                elif isinstance(last, dict):
-                    content = last.get('content','')
-                    if content:
-                        print(f"🤖 Assistant: {content}\n")
-        except KeyboardInterrupt:
-            print("\n\n👋 프로그램을 종료합니다.\n")
+        prompt_ready.set()
+        user_input = await inbox.get()
+        if user_input is None:
+            print("\n👋 프로그램을 종료합니다.\n")
             break
+        user_input = user_input.strip()
+        if not user_input:
+            continue
+        if user_input.lower() in ['quit','exit','종료']:
+            print("\n👋 프로그램을 종료합니다.\n")
+            break
+        stop = threading.Event()
+        try:
+            await _start_reply(loop, agent, user_input, stop)
         except Exception as e:
             print(f"\n❌ 오류 발생: {str(e)}\n")
             import traceback; traceback.print_exc()
+        finally:
+            # Ctrl+C로 취소되면 스트리밍 스레드도 다음 청크에서 멈춘다
+            stop.set()
+
+
+def main():
+    try:
+        asyncio.run(main_async())
+    except KeyboardInterrupt:
+        print("\n\n👋 프로그램을 종료합니다.\n")
 
 if __name__ == "__main__":
     main()
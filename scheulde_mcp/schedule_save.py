@@ -11,19 +11,43 @@ import sys
 import logging
 import time as _time
 import sqlite3
+import hashlib
 import os
-from datetime import datetime, timedelta
-from typing import Any, Optional, Dict, Tuple
+import re
+import threading
+from calendar import monthrange
+from collections import OrderedDict
+from functools import lru_cache, partial
+from datetime import datetime, timedelta, date as _date
+from typing import Any, Optional, Dict, Tuple, Union
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 # ===== Config =====
 WEEKDAY_KO = ["월", "화", "수", "목", "금", "토", "일"]
+# "월".."일" and "MON".."SUN" -> weekday number
+_WEEKDAY_LOOKUP = {k: i for i, k in enumerate(WEEKDAY_KO)}
+_WEEKDAY_LOOKUP.update({"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6})
+_VALID_MODES = frozenset({"ABSOLUTE", "TOKEN"})
 SLOT_TABLE = {"MORNING": "09:00", "AFTERNOON": "15:00", "EVENING": "19:00", "NIGHT": "21:00"}
 DEDUP_TTL_SEC = 90  # within 90s, identical idempotency_key or (date,time,content) is ignored
+DEDUP_MAX_KEYS = 4096  # hard cap on remembered keys (oldest evicted first)
+SAVE_BATCH_MAX = 32  # max saves committed in one transaction
+_HHMM_RE = re.compile(r"(?:[01]?\d|2[0-3]):[0-5]?\d")  # same inputs strptime("%H:%M") accepts
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")  # zero-padded YYYY-MM-DD only
 DB_PATH = os.path.join(os.path.dirname(__file__), "schedules.db")
 
+# ===== Response templates =====
+_NO_TIME = "(시간 없음)"
+_SUCCESS_TMPL = ("✅ 일정 저장 완료! (UTC, DB ID: {row_id})\n"
+                 "📅 {date} ({dow}) {time}\n"
+                 "📝 {content}\n"
+                 "📊 총 {total}개의 일정이 저장되어 있습니다.")
+_DUPLICATE_TMPL = (f"⚠️ 중복 요청 감지(최근 {DEDUP_TTL_SEC}s 내). 저장은 수행하지 않았습니다.\n"
+                   "📌 key={key}..., 📅 {date} {time}\n"
+                   "📝 {content}")
+
 # ===== Logging =====
 logging.basicConfig(filename='schedule_save_mcp_utc.log', level=logging.DEBUG, format='%(asctime)s [%(levelname)s] %(message)s')
 console = logging.StreamHandler(sys.stderr)
@@ -32,10 +56,19 @@ logging.getLogger().addHandler(console)
 logging.info("=== Schedule Save MCP Server (UTC-only, SQLite) Starting ===")
 
 # ===== Database Setup =====
+# single long-lived connection (autocommit, WAL) shared by all handlers
+_CONN: Optional[sqlite3.Connection] = None
+_DB_LOCK = threading.Lock()
+
 def init_db():
-    """Initialize SQLite database with schedules table"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """Open the shared SQLite connection and initialize the schedules table"""
+    global _CONN
+    _CONN = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    _CONN.execute("PRAGMA journal_mode=WAL")
+    _CONN.execute("PRAGMA synchronous=NORMAL")
+    _CONN.execute("PRAGMA cache_size=-8000")
+    _CONN.execute("PRAGMA temp_store=MEMORY")
+    cursor = _CONN.cursor()
     
     # Create schedules table
     cursor.execute('''
@@ -49,12 +82,13 @@ def init_db():
         )
     ''')
     
-    # Create indexes for common queries
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON schedules(date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_created_at ON schedules(created_at)')
+    # Create indexes for common queries: date range filter ordered by time.
+    # (date, time) also serves date-only lookups, so the single-column indexes are dropped.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_date_time ON schedules(date, time)')
+    cursor.execute('DROP INDEX IF EXISTS idx_date')
+    cursor.execute('DROP INDEX IF EXISTS idx_created_at')
+    cursor.execute('ANALYZE')
     
-    conn.commit()
-    conn.close()
     logging.info(f"Database initialized at {DB_PATH}")
 
 # Initialize database on startup
@@ -63,8 +97,9 @@ init_db()
 # ===== MCP App =====
 app = Server("schedule-save-server-utc")
 
-# recent dedup store: key -> timestamp
-_recent_keys: Dict[str, float] = {}
+# recent dedup store: key (idempotency_key str or fingerprint bytes) -> timestamp,
+# kept in insertion (= expiry) order
+_recent_keys: "OrderedDict[Union[str, bytes], float]" = OrderedDict()
 
 # ===== Utils =====
 def _now(anchor_now: Optional[str] = None) -> datetime:
@@ -82,10 +117,18 @@ def _weekday_ko(dt: datetime) -> str:
     return WEEKDAY_KO[dt.weekday()]
 
 def _ensure_hhmm(s: str) -> None:
-    datetime.strptime(s, "%H:%M")
+    if not _HHMM_RE.fullmatch(s):
+        raise ValueError(f"time data {s!r} does not match format '%H:%M'")
+
+def _parse_date(s: str) -> datetime:
+    # fromisoformat only for plain YYYY-MM-DD (it would also take times, week dates, 20250105);
+    # strptime handles the rest, e.g. unpadded 2025-1-5, and rejects what it always rejected
+    if _ISO_DATE_RE.fullmatch(s):
+        return datetime.combine(_date.fromisoformat(s), datetime.min.time())
+    return datetime.strptime(s, "%Y-%m-%d")
 
 def _to_date_string(dt: datetime) -> str:
-    return dt.strftime("%Y-%m-%d")
+    return dt.date().isoformat()
 
 def _roll_to_week_anchor(base: datetime, anchor: str, n: Optional[int] = None) -> datetime:
     anchor = (anchor or "THIS_WEEK").upper()
@@ -101,7 +144,6 @@ def _roll_to_week_anchor(base: datetime, anchor: str, n: Optional[int] = None) -
     raise ValueError(f"Unknown anchor: {anchor}")
 
 def _nth_weekday_of_month(base: datetime, n: int, weekday: int) -> datetime:
-    from calendar import monthrange
     y, m = base.year, base.month
     first_weekday, days_in_month = monthrange(y, m)
     delta = (weekday - first_weekday) % 7
@@ -113,83 +155,128 @@ def _nth_weekday_of_month(base: datetime, n: int, weekday: int) -> datetime:
 
 def _weekday_to_num(label: str) -> int:
     label = (label or "").strip()
-    m_ko = {k: i for i, k in enumerate(WEEKDAY_KO)}
-    m_en = {"MON":0, "TUE":1, "WED":2, "THU":3, "FRI":4, "SAT":5, "SUN":6}
-    if label in m_ko:
-        return m_ko[label]
-    u = label.upper()
-    if u in m_en:
-        return m_en[u]
+    n = _WEEKDAY_LOOKUP.get(label)
+    if n is None:
+        n = _WEEKDAY_LOOKUP.get(label.upper())
+    if n is not None:
+        return n
     raise ValueError(f"weekday parse failed: {label}")
 
 # ===== TOKEN resolvers =====
+def _date_this_month(now: datetime, token: dict) -> datetime:
+    result = now.replace(day=now.day)
+    # LLM이 day를 지정한 경우 해당 일자로 변경
+    if token.get("day"):
+        try:
+            result = now.replace(day=int(token.get("day")))
+        except ValueError:
+            pass  # 잘못된 day 값은 무시
+    return result
+
+def _date_next_month(now: datetime, token: dict) -> datetime:
+    m = now.month + 1
+    y = now.year + (1 if m == 13 else 0)
+    m = 1 if m == 13 else m
+    result_day = now.day if not token.get("day") else int(token.get("day"))
+    # 해당 월의 마지막 날을 초과하지 않도록
+    max_day = monthrange(y, m)[1]
+    result_day = min(result_day, max_day)
+    return now.replace(year=y, month=m, day=result_day)
+
+def _date_same_month(now: datetime, token: dict) -> datetime:
+    return now.replace(day=int(token.get("day")))
+
+def _date_after_n_day(now: datetime, token: dict) -> datetime:
+    # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
+    n = token.get("n") or token.get("value") or 0
+    n = abs(int(n))  # 음수가 들어와도 절댓값으로 처리
+    return now + timedelta(days=n)
+
+def _date_week(now: datetime, token: dict, anchor: str) -> datetime:
+    base = _roll_to_week_anchor(now, anchor, token.get("n"))
+    # LLM이 weekday를 함께 지정한 경우 해당 요일로 이동
+    if token.get("weekday"):
+        weekday = _weekday_to_num(token.get("weekday"))
+        monday = base - timedelta(days=base.weekday())
+        return monday + timedelta(days=weekday)
+    return base
+
+def _date_weekday_of(now: datetime, token: dict) -> datetime:
+    weekday = _weekday_to_num(token.get("weekday", ""))
+    anchor = token.get("anchor") or "THIS_WEEK"  # anchor 없으면 THIS_WEEK 기본값
+    n = token.get("n")
+    base = _roll_to_week_anchor(now, anchor, n)
+    monday = base - timedelta(days=base.weekday())
+    return monday + timedelta(days=weekday)
+
+def _date_nth_weekday_of_month(now: datetime, token: dict) -> datetime:
+    # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
+    n = token.get("n") or token.get("value")
+    n = int(n)
+    weekday = _weekday_to_num(token.get("weekday", ""))
+    anchor = token.get("anchor") or "THIS_MONTH"  # anchor 없으면 THIS_MONTH 기본값
+    anchor = anchor.upper()
+    ref = now.replace(day=1)
+    if anchor == "NEXT_MONTH":
+        m = now.month + 1
+        y = now.year + (1 if m == 13 else 0)
+        m = 1 if m == 13 else m
+        ref = now.replace(year=y, month=m, day=1)
+    return _nth_weekday_of_month(ref, n, weekday)
+
+def _date_end_of_month(now: datetime, token: dict) -> datetime:
+    days = monthrange(now.year, now.month)[1]
+    return now.replace(day=days)
+
+def _date_begin_of_month(now: datetime, token: dict) -> datetime:
+    return now.replace(day=1)
+
+_DATE_HANDLERS = {
+    "THIS_MONTH": _date_this_month,
+    "NEXT_MONTH": _date_next_month,
+    "SAME_MONTH_DATA": _date_same_month,
+    "AFTER_N_DAY": _date_after_n_day,
+    "THIS_WEEK": partial(_date_week, anchor="THIS_WEEK"),
+    "NEXT_WEEK": partial(_date_week, anchor="NEXT_WEEK"),
+    "AFTER_N_WEEK": partial(_date_week, anchor="AFTER_N_WEEK"),
+    "WEEKDAY_OF": _date_weekday_of,
+    "NTH_WEEKDAY_OF_MONTH": _date_nth_weekday_of_month,
+    "END_OF_MONTH": _date_end_of_month,
+    "BEGIN_OF_MONTH": _date_begin_of_month,
+}
+
 def resolve_date_token(now: datetime, token: dict) -> datetime:
     t = (token.get("type") or "").upper()
     if not t:
         raise ValueError("date_token.type required")
-
-    if t == "THIS_MONTH":
-        result = now.replace(day=now.day)
-        # LLM이 day를 지정한 경우 해당 일자로 변경
-        if token.get("day"):
-            try:
-                result = now.replace(day=int(token.get("day")))
-            except ValueError:
-                pass  # 잘못된 day 값은 무시
-        return result
-    if t == "NEXT_MONTH":
-        m = now.month + 1
-        y = now.year + (1 if m == 13 else 0)
-        m = 1 if m == 13 else m
-        result_day = now.day if not token.get("day") else int(token.get("day"))
-        # 해당 월의 마지막 날을 초과하지 않도록
-        from calendar import monthrange
-        max_day = monthrange(y, m)[1]
-        result_day = min(result_day, max_day)
-        return now.replace(year=y, month=m, day=result_day)
-    if t == "SAME_MONTH_DATA":
-        return now.replace(day=int(token.get("day")))
-    if t == "AFTER_N_DAY":
-        # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
-        n = token.get("n") or token.get("value") or 0
-        n = abs(int(n))  # 음수가 들어와도 절댓값으로 처리
-        return now + timedelta(days=n)
-    if t in ("NEXT_WEEK", "AFTER_N_WEEK", "THIS_WEEK"):
-        base = _roll_to_week_anchor(now, t, token.get("n"))
-        # LLM이 weekday를 함께 지정한 경우 해당 요일로 이동
-        if token.get("weekday"):
-            weekday = _weekday_to_num(token.get("weekday"))
-            monday = base - timedelta(days=base.weekday())
-            return monday + timedelta(days=weekday)
-        return base
-    if t == "WEEKDAY_OF":
-        weekday = _weekday_to_num(token.get("weekday", ""))
-        anchor = token.get("anchor") or "THIS_WEEK"  # anchor 없으면 THIS_WEEK 기본값
-        n = token.get("n")
-        base = _roll_to_week_anchor(now, anchor, n)
-        monday = base - timedelta(days=base.weekday())
-        return monday + timedelta(days=weekday)
-    if t == "NTH_WEEKDAY_OF_MONTH":
-        # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
-        n = token.get("n") or token.get("value")
-        n = int(n)
-        weekday = _weekday_to_num(token.get("weekday", ""))
-        anchor = token.get("anchor") or "THIS_MONTH"  # anchor 없으면 THIS_MONTH 기본값
-        anchor = anchor.upper()
-        ref = now.replace(day=1)
-        if anchor == "NEXT_MONTH":
-            m = now.month + 1
-            y = now.year + (1 if m == 13 else 0)
-            m = 1 if m == 13 else m
-            ref = now.replace(year=y, month=m, day=1)
-        return _nth_weekday_of_month(ref, n, weekday)
-    if t == "END_OF_MONTH":
-        from calendar import monthrange
-        days = monthrange(now.year, now.month)[1]
-        return now.replace(day=days)
-    if t == "BEGIN_OF_MONTH":
-        return now.replace(day=1)
-    raise ValueError(f"unknown date_token.type: {t}")
+    handler = _DATE_HANDLERS.get(t)
+    if handler is None:
+        raise ValueError(f"unknown date_token.type: {t}")
+    return handler(now, token)
+
+def _time_abs(now: datetime, token: dict) -> str:
+    val = token.get("value", "")
+    _ensure_hhmm(val)
+    return val
+
+def _time_slot(now: datetime, token: dict) -> str:
+    slot = (token.get("slot") or "").upper()
+    if slot not in SLOT_TABLE:
+        raise ValueError(f"unknown slot: {slot}")
+    return SLOT_TABLE[slot]
+
+def _time_after_n_hour(now: datetime, token: dict) -> str:
+    # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
+    n = token.get("n") or token.get("value") or 0
+    n = abs(int(n))  # 음수가 들어와도 절댓값으로 처리
+    target = now + timedelta(hours=n)
+    return f"{target.hour:02d}:{target.minute:02d}"
+
+_TIME_HANDLERS = {
+    "ABS": _time_abs,
+    "SLOT": _time_slot,
+    "AFTER_N_HOUR": _time_after_n_hour,
+}
 
 def resolve_time_token(now: datetime, token: dict) -> Optional[str]:
     if not token:
@@ -197,54 +284,114 @@ def resolve_time_token(now: datetime, token: dict) -> Optional[str]:
     t = (token.get("type") or "").upper()
     if not t:
         return None
-    if t == "ABS":
-        val = token.get("value", "")
-        _ensure_hhmm(val)
-        return val
-    if t == "SLOT":
-        slot = (token.get("slot") or "").upper()
-        if slot not in SLOT_TABLE:
-            raise ValueError(f"unknown slot: {slot}")
-        return SLOT_TABLE[slot]
-    if t == "AFTER_N_HOUR":
-        # n 또는 value 파라미터 모두 허용 (LLM 실수 대응)
-        n = token.get("n") or token.get("value") or 0
-        n = abs(int(n))  # 음수가 들어와도 절댓값으로 처리
-        target = (now + timedelta(hours=n)).time().replace(second=0, microsecond=0)
-        return target.strftime("%H:%M")
-    return None
+    handler = _TIME_HANDLERS.get(t)
+    if handler is None:
+        return None
+    return handler(now, token)
 
-# ===== Database Functions =====
-def save_schedule_to_db(schedule: dict) -> int:
-    """Save schedule to database and return the inserted row ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO schedules (date, day_of_week, time, content, created_at)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
-        schedule['date'],
-        schedule['day_of_week'],
-        schedule['time'],
-        schedule['content'],
-        schedule['created_at']
-    ))
-    
-    row_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return row_id
+# ===== Resolver cache =====
+# The LLM often saves several items with the same token in one turn ("다음주 금요일 저녁에 A, B, C").
+# Date results only depend on today's date, time results only on the current HH:MM.
+def _token_key(token: dict) -> Optional[tuple]:
+    try:
+        key = tuple(sorted(token.items()))
+        hash(key)
+    except TypeError:
+        return None  # nested/unhashable values -> resolve without the cache
+    return key
+
+@lru_cache(maxsize=256)
+def _resolve_date_cached(day_ordinal: int, token_key: tuple) -> datetime:
+    return resolve_date_token(datetime.fromordinal(day_ordinal), dict(token_key))
+
+@lru_cache(maxsize=256)
+def _resolve_time_cached(hour: int, minute: int, token_key: tuple) -> Optional[str]:
+    return resolve_time_token(datetime(2000, 1, 1, hour, minute), dict(token_key))
+
+def resolve_date_token_cached(now: datetime, token: dict) -> datetime:
+    key = _token_key(token)
+    if key is None:
+        return resolve_date_token(now, token)
+    return _resolve_date_cached(now.toordinal(), key)
+
+def resolve_time_token_cached(now: datetime, token: dict) -> Optional[str]:
+    if not token:
+        return None
+    key = _token_key(token)
+    if key is None:
+        return resolve_time_token(now, token)
+    return _resolve_time_cached(now.hour, now.minute, key)
 
-def get_schedule_count() -> int:
-    """Get total number of schedules in database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM schedules')
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+# ===== Database Functions =====
+_INSERT_SQL = '''
+    INSERT INTO schedules (date, day_of_week, time, content, created_at)
+    VALUES (?, ?, ?, ?, ?)
+    RETURNING id
+'''
+
+def save_schedules_to_db(schedules: list) -> list:
+    """Save schedules in one transaction and return [(inserted row ID, total schedule count), ...].
+
+    The total is COUNT(*) read inside the same transaction right after the inserts, so it
+    also reflects rows written or deleted by other processes (schedule_query.py, manual edits).
+    """
+    results = []
+    with _DB_LOCK:
+        _CONN.execute("BEGIN")
+        try:
+            for schedule in schedules:
+                cursor = _CONN.execute(_INSERT_SQL, (
+                    schedule['date'],
+                    schedule['day_of_week'],
+                    schedule['time'],
+                    schedule['content'],
+                    schedule['created_at']
+                ))
+                row_id = cursor.fetchone()[0]
+                cursor.close()
+                results.append(row_id)
+            total_count = _CONN.execute('SELECT COUNT(*) FROM schedules').fetchone()[0]
+            _CONN.execute("COMMIT")
+        except Exception:
+            _CONN.execute("ROLLBACK")
+            raise
+    return [(row_id, total_count) for row_id in results]
+
+# ===== Save batching =====
+# saves already queued when the writer wakes share one transaction (= one fsync); no waiting
+_save_queue: Optional[asyncio.Queue] = None
+_save_worker: Optional[asyncio.Task] = None
+
+async def _save_batch_loop(queue: asyncio.Queue) -> None:
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < SAVE_BATCH_MAX:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            results = save_schedules_to_db([schedule for schedule, _ in batch])
+        except Exception as e:
+            logging.error("batched schedule save failed", exc_info=True)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            continue
+        logging.debug(f"Saved batch of {len(batch)} schedule(s)")
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+async def save_schedule(schedule: dict) -> Tuple[int, int]:
+    """Queue a schedule for the batch writer and wait for (row ID, total count)"""
+    global _save_queue, _save_worker
+    if _save_worker is None or _save_worker.done():
+        _save_queue = asyncio.Queue()
+        _save_worker = asyncio.create_task(_save_batch_loop(_save_queue))
+    fut = asyncio.get_running_loop().create_future()
+    await _save_queue.put((schedule, fut))
+    return await fut
 
 # ===== Tools =====
 @app.list_tools()
@@ -278,20 +425,29 @@ async def list_tools() -> list[Tool]:
     return tools
 
 # ===== Dedup helpers =====
-def _make_fingerprint(content: str, date: str, time_str: Optional[str]) -> str:
+def _make_fingerprint(content: str, date: str, time_str: Optional[str]) -> bytes:
+    # dedup only has to hold for DEDUP_TTL_SEC, a 128-bit BLAKE2b digest is plenty
     base = f"{content}|{date}|{time_str or ''}"
-    import hashlib
-    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+    return hashlib.blake2b(base.encode("utf-8"), digest_size=16).digest()
+
+def _key_preview(key: Union[str, bytes]) -> str:
+    return key[:4].hex() if isinstance(key, bytes) else key[:8]
 
-def _is_duplicate(key: str) -> Tuple[bool, Optional[float]]:
+def _is_duplicate(key: Union[str, bytes]) -> Tuple[bool, Optional[float]]:
     now_ts = _time.time()
-    # purge old
-    for k, ts in list(_recent_keys.items()):
-        if now_ts - ts > DEDUP_TTL_SEC:
-            _recent_keys.pop(k, None)
-    if key in _recent_keys and (now_ts - _recent_keys[key] <= DEDUP_TTL_SEC):
-        return True, _recent_keys[key]
+    # lazy purge: drop at most the (oldest) head entry per call; the size cap bounds the rest
+    if _recent_keys:
+        head_ts = next(iter(_recent_keys.values()))
+        if now_ts - head_ts > DEDUP_TTL_SEC:
+            _recent_keys.popitem(last=False)
+    ts = _recent_keys.get(key)
+    if ts is not None:
+        if now_ts - ts <= DEDUP_TTL_SEC:
+            return True, ts
+        del _recent_keys[key]  # stale entry not purged yet; re-insert at the tail
     _recent_keys[key] = now_ts
+    while len(_recent_keys) > DEDUP_MAX_KEYS:
+        _recent_keys.popitem(last=False)
     return False, None
 
 # ===== Call Tool =====
@@ -319,7 +475,7 @@ async def handle_schedule_save(arguments: Any) -> list[TextContent]:
         return [TextContent(type="text", text="❌ content와 when이 필요합니다")]
 
     mode = (when.get("mode") or "").upper()
-    if mode not in ("ABSOLUTE", "TOKEN"):
+    if mode not in _VALID_MODES:
         return [TextContent(type="text", text="❌ when.mode는 ABSOLUTE 또는 TOKEN만 허용")]
 
     now = _now(anchor_now)
@@ -330,15 +486,15 @@ async def handle_schedule_save(arguments: Any) -> list[TextContent]:
         if not date:
             return [TextContent(type="text", text="❌ ABSOLUTE 모드에는 date가 필요합니다")]
         try:
-            datetime.strptime(date, "%Y-%m-%d")
+            dt_date = _parse_date(date)
             if time_str:
                 _ensure_hhmm(time_str)
         except Exception as e:
             return [TextContent(type="text", text=f"❌ 형식 오류: {e}")]
-        dt_date = datetime.strptime(date, "%Y-%m-%d")
+        date = _to_date_string(dt_date)  # normalize e.g. 2025-1-5 -> 2025-01-05
     else:
-        dt_date = resolve_date_token(now, when.get("date_token", {}))
-        time_str = resolve_time_token(now, when.get("time_token", {}))
+        dt_date = resolve_date_token_cached(now, when.get("date_token", {}))
+        time_str = resolve_time_token_cached(now, when.get("time_token", {}))
         date = _to_date_string(dt_date)
 
     # dedup
@@ -346,28 +502,27 @@ async def handle_schedule_save(arguments: Any) -> list[TextContent]:
     key = idem or fingerprint
     dup, ts = _is_duplicate(key)
     if dup:
-        msg = (f"⚠️ 중복 요청 감지(최근 {DEDUP_TTL_SEC}s 내). 저장은 수행하지 않았습니다.\n"
-               f"📌 key={key[:8]}..., 📅 {date} {time_str or '(시간 없음)'}\n"
-               f"📝 {content}")
+        msg = _DUPLICATE_TMPL.format_map({
+            "key": _key_preview(key), "date": date, "time": time_str or _NO_TIME, "content": content,
+        })
         return [TextContent(type="text", text=msg)]
 
     dow = _weekday_ko(dt_date)
     schedule = {
-        "date": _to_date_string(dt_date),
+        "date": date,
         "day_of_week": dow,
         "time": time_str,
         "content": content,
-        "created_at": datetime.utcnow().replace(microsecond=0).isoformat() + "Z"  # UTC ISO8601
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z"  # UTC ISO8601
     }
     
     # Save to database
-    row_id = save_schedule_to_db(schedule)
-    total_count = get_schedule_count()
+    row_id, total_count = await save_schedule(schedule)
 
-    msg = (f"✅ 일정 저장 완료! (UTC, DB ID: {row_id})\n"
-           f"📅 {schedule['date']} ({schedule['day_of_week']}) {schedule['time'] or '(시간 없음)'}\n"
-           f"📝 {content}\n"
-           f"📊 총 {total_count}개의 일정이 저장되어 있습니다.")
+    msg = _SUCCESS_TMPL.format_map({
+        "row_id": row_id, "date": date, "dow": dow, "time": time_str or _NO_TIME,
+        "content": content, "total": total_count,
+    })
     logging.info(f"Saved schedule to DB (ID: {row_id}): {schedule}")
     return [TextContent(type="text", text=msg)]
 
@@ -1,16 +1,30 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import requests
+import httpx
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
 import json
-from pymilvus import MilvusClient
+import orjson
+import numpy as np
+import hashlib
+from collections import OrderedDict
+from pymilvus import MilvusClient, DataType
 
 
 def _to_json_ids(ids_raw):
     """Milvus가 반환한 id 리스트를 JSON 직렬화 가능한 기본형으로 변환"""
+    ids_raw = list(ids_raw or [])
+    try:
+        # numpy.int64 등 정수 id는 한 번에 캐스팅
+        return np.asarray(ids_raw, dtype=np.int64).tolist()
+    except Exception:
+        pass
     out = []
-    for x in (ids_raw or []):
+    for x in ids_raw:
         try:
             # numpy.int64 등도 int()로 캐스팅
             out.append(int(x))
@@ -18,11 +32,31 @@ def _to_json_ids(ids_raw):
             # 혹시 캐스팅 실패하면 문자열로라도 반환
             out.append(str(x))
     return out
-app = FastAPI(title="Milvus Lite Vector Search API")
+app = FastAPI(title="Milvus Lite Vector Search API", default_response_class=ORJSONResponse)
 
 # 환경 변수
 LLAMA_SERVER_URL = os.getenv("LLAMA_SERVER_URL", "http://localhost:8080")
 MILVUS_DB_DIR = "./milvus_data"
+# 비워두면 Milvus Lite(프로세스 내장 DB 파일), 지정하면 Milvus 서버 (예: http://milvus:19530)
+# Milvus Lite는 DB 파일을 한 프로세스만 열 수 있으므로 WEB_CONCURRENCY > 1 이면 서버 모드가 필요
+MILVUS_URI = os.getenv("MILVUS_URI", "")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# pymilvus 동기 호출용 스레드 수 (CPU 수가 아니라 Milvus 서버가 감당할 동시 요청 수에 맞춤)
+MILVUS_POOL_SIZE = int(os.getenv("MILVUS_POOL_SIZE", "16"))
+# 새로 만드는 컬렉션의 벡터 저장 형식
+#   fp32: FLOAT_VECTOR (기존 방식)
+#   fp16: FLOAT16_VECTOR + IVF_SQ8 인덱스 (저장 용량/메모리 대역폭 절반)
+#   int8: FLOAT_VECTOR + IVF_SQ8 인덱스 (인덱스 안에서 8bit 스칼라 양자화, 1/4)
+# 이미 있는 컬렉션은 각자 스키마의 벡터 타입을 따름 (_collection_vector_dtype)
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "fp32").lower()
+if VECTOR_DTYPE in ("fp16", "int8") and not MILVUS_URI:
+    # Milvus Lite는 인덱스 종류와 상관없이 FLAT으로 만들어서 양자화 효과가 없음
+    print(f"⚠️ VECTOR_DTYPE={VECTOR_DTYPE}는 Milvus 서버(MILVUS_URI)에서만 지원합니다. fp32로 실행합니다")
+    VECTOR_DTYPE = "fp32"
+# IVF 인덱스(IVF_SQ8 등) 검색 시 탐색할 클러스터 수. 지정하지 않으면 Milvus 기본 nprobe=1 이라
+# nlist=1024 중 1개(약 0.1%)만 보고 recall이 크게 떨어짐. 클수록 정확하지만 느림
+IVF_NLIST = 1024
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", "32"))
 
 # Milvus 데이터 디렉토리 생성
 os.makedirs(MILVUS_DB_DIR, exist_ok=True)
@@ -30,13 +64,63 @@ os.makedirs(MILVUS_DB_DIR, exist_ok=True)
 # Milvus 클라이언트 (lazy initialization)
 _milvus_client = None
 
+# 존재가 확인된 컬렉션 이름 (has_collection RPC 생략용)
+# 프로세스마다 따로라서 다른 워커/클라이언트가 삭제하면 오래된 값이 남음 -> 호출 실패 시 다시 확인
+_known_collections: set = set()
+
+# 컬렉션별로 Milvus에 보낼 벡터의 numpy dtype (스키마의 벡터 필드 타입 기준, describe_collection 생략용)
+_collection_dtypes: dict = {}
+
+# 컬렉션별 search_params (IVF 인덱스면 nprobe 지정, 그 외는 빈 dict)
+_collection_search_param_cache: dict = {}
+
+
+def _forget_collection(collection_name: str):
+    """삭제됐거나 캐시가 오래된 컬렉션 정보를 버림"""
+    _known_collections.discard(collection_name)
+    _collection_dtypes.pop(collection_name, None)
+    _collection_search_param_cache.pop(collection_name, None)
+
+# Milvus 호출 전용 스레드풀 (startup에서 생성, 이벤트 루프를 막지 않도록)
+_milvus_pool: Optional[ThreadPoolExecutor] = None
+
+# llama.cpp 서버용 HTTP 클라이언트 (startup에서 생성, 커넥션 풀 공유)
+_http: Optional[httpx.AsyncClient] = None
+
+
+@app.on_event("startup")
+async def _open_http_client():
+    global _http, _milvus_pool
+    _milvus_pool = ThreadPoolExecutor(max_workers=MILVUS_POOL_SIZE, thread_name_prefix="milvus")
+    _http = httpx.AsyncClient(
+        base_url=LLAMA_SERVER_URL,
+        timeout=30,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    )
+    embed_queue.start()
+
+
+@app.on_event("shutdown")
+async def _close_http_client():
+    await embed_queue.stop()
+    if _http is not None:
+        await _http.aclose()
+    if _milvus_pool is not None:
+        _milvus_pool.shutdown(wait=False)
+
+async def _run_milvus(func, *args, **kwargs):
+    """pymilvus 동기 호출을 Milvus 전용 스레드풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_milvus_pool, partial(func, *args, **kwargs))
+
+
 def get_milvus_client():
     """Milvus 클라이언트 가져오기 (싱글톤)"""
     global _milvus_client
     if _milvus_client is None:
-        # Milvus Lite 초기화
+        # Milvus Lite 초기화 (MILVUS_URI가 있으면 서버에 연결)
         db_file = os.path.join(MILVUS_DB_DIR, "milvus_demo.db")
-        _milvus_client = MilvusClient(db_file)
+        _milvus_client = MilvusClient(MILVUS_URI or db_file)
     return _milvus_client
 
 
@@ -47,6 +131,16 @@ class InsertRequest(BaseModel):
     metadata: Optional[dict] = None
 
 
+class InsertItem(BaseModel):
+    content: str
+    metadata: Optional[dict] = None
+
+
+class InsertBatchRequest(BaseModel):
+    db_name: str
+    items: List[InsertItem]
+
+
 class SearchRequest(BaseModel):
     db_name: str
     query: str
@@ -60,54 +154,59 @@ class SearchResult(BaseModel):
 
 
 # 임베딩 생성 함수 (다양한 응답 포맷을 안전하게 처리)
-def get_embedding(text: str) -> List[float]:
-    """llama.cpp 서버에서 임베딩 생성"""
+def _vector_from_dict(item: dict):
+    return item.get("embedding")
+
+
+def _vector_from_list(item: list):
+    return item
+
+
+# 응답 항목 타입별 벡터 추출기 ({"embedding": [...]} 또는 [...])
+_VECTOR_PARSERS = {dict: _vector_from_dict, list: _vector_from_list}
+
+# 응답 최상위 타입별 항목 리스트 추출기 ({"data": [...]} 또는 [...])
+_ITEMS_PARSERS = {dict: lambda result: result.get("data"), list: lambda result: result}
+
+
+def _extract_vector(item):
+    """응답 항목 하나에서 벡터 추출 (2차원이면 첫 벡터)"""
+    parser = _VECTOR_PARSERS.get(type(item))
+    embedding = parser(item) if parser else None
+    if embedding and type(embedding[0]) is list:
+        embedding = embedding[0]
+    # 첫 원소만 검사 (1024차원 전체 스캔 생략)
+    if type(embedding) is not list or not embedding or not isinstance(embedding[0], (int, float)):
+        raise ValueError(f"임베딩 응답 형식 오류: {item}")
+    return embedding
+
+
+async def get_embeddings(texts: List[str]) -> List[np.ndarray]:
+    """llama.cpp 서버에서 여러 텍스트의 임베딩을 한 번의 요청으로 생성 (OpenAI 호환 /v1/embeddings)"""
     try:
-        response = requests.post(
-            f"{LLAMA_SERVER_URL}/embedding",
-            json={"content": text},
-            timeout=30
-        )
+        response = await _http.post("/v1/embeddings", json={"input": texts})
         response.raise_for_status()
-        result = response.json()
-
-        embedding = None
-
-        # 1) 최상위가 dict
-        if isinstance(result, dict):
-            if "embedding" in result:
-                embedding = result["embedding"]
-            elif "data" in result and isinstance(result["data"], list) and result["data"]:
-                item = result["data"][0]
-                if isinstance(item, dict) and "embedding" in item:
-                    embedding = item["embedding"]
-
-        # 2) 최상위가 list (예: [{"index":0,"embedding":[...]}] 또는 [[...]])
-        if embedding is None and isinstance(result, list) and result:
-            first = result[0]
-            if isinstance(first, dict) and "embedding" in first:
-                embedding = first["embedding"]
-            elif isinstance(first, list):
-                embedding = first
-
-        # 3) 2차원([[...]] )이면 첫 벡터만 사용
-        if isinstance(embedding, list) and embedding and isinstance(embedding[0], list):
-            embedding = embedding[0]
-
-        # 기본 검증
-        if not isinstance(embedding, list) or not embedding or not all(isinstance(x, (int, float)) for x in embedding):
+        result = orjson.loads(response.content)
+
+        # {"data": [{"index": 0, "embedding": [...]}, ...]} 또는 [{"index":0,"embedding":[...]}, ...]
+        parser = _ITEMS_PARSERS.get(type(result))
+        items = parser(result) if parser else None
+        if type(items) is not list or len(items) != len(texts):
             raise ValueError(f"임베딩 응답 형식 오류: {result}")
+        if all(isinstance(it, dict) and "index" in it for it in items):
+            items = sorted(items, key=lambda it: it["index"])
 
-        return embedding
+        # float32 배열로 한 번만 변환 (컬렉션이 FLOAT16_VECTOR면 보낼 때 float16으로)
+        return list(np.asarray([_extract_vector(it) for it in items], dtype=np.float32))
 
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         raise HTTPException(
             status_code=503,
             detail=f"llama.cpp 서버에 연결할 수 없습니다: {LLAMA_SERVER_URL}"
         )
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="임베딩 생성 시간 초과 (30초)")
-    except requests.exceptions.HTTPError:
+    except httpx.HTTPStatusError:
         raise HTTPException(
             status_code=response.status_code,
             detail=f"llama.cpp 서버 오류 (status {response.status_code}): {response.text}"
@@ -118,20 +217,220 @@ def get_embedding(text: str) -> List[float]:
         raise HTTPException(status_code=500, detail=f"임베딩 생성 실패: {type(e).__name__}: {str(e)}")
 
 
+class EmbeddingBatcher:
+    """짧은 시간 창(max_wait_ms) 안에 들어온 임베딩 요청을 모아 한 번의 /v1/embeddings 호출로 처리
+
+    배치가 실패하면 항목별로 재시도하므로, 잘못된 입력 하나가 같은 배치의 다른 요청까지 실패시키지 않음.
+    """
+
+    def __init__(self, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, text: str) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                embeddings = await get_embeddings([text for text, _ in batch])
+            except Exception as e:
+                await self._retry_individually(batch, e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    @staticmethod
+    async def _retry_individually(batch, error: Exception):
+        """배치 호출 실패 시 항목별로 다시 요청해서 실제로 실패한 입력의 future만 실패 처리
+
+        서버 연결 실패/시간 초과(503/504)는 입력과 무관하므로 재시도 없이 전체 실패.
+        """
+        if len(batch) == 1 or (isinstance(error, HTTPException) and error.status_code in (503, 504)):
+            results = [error] * len(batch)
+        else:
+            results = await asyncio.gather(
+                *(get_embeddings([text]) for text, _ in batch), return_exceptions=True
+            )
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result[0])
+
+
+embed_queue = EmbeddingBatcher(
+    max_batch=int(os.getenv("EMBED_BATCH_MAX", "32")),
+    max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")),
+)
+
+
+# 임베딩 캐시 (같은 텍스트는 llama.cpp를 다시 부르지 않음)
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "exact").lower()   # exact | off
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+_embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+async def get_embedding(text: str) -> np.ndarray:
+    """단일 텍스트 임베딩 (캐시 확인 후, 동시 요청은 embed_queue에서 묶여서 처리됨)"""
+    if EMBEDDING_CACHE != "exact":
+        return await embed_queue.submit(text)
+
+    key = _cache_key(text)
+    embedding = _embedding_cache.get(key)
+    if embedding is not None:
+        _embedding_cache.move_to_end(key)
+        return embedding
+
+    embedding = await embed_queue.submit(text)
+    _embedding_cache[key] = embedding
+    if len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+        _embedding_cache.popitem(last=False)
+    return embedding
+
+
+async def embed_many(texts: List[str]) -> List[np.ndarray]:
+    """여러 텍스트 임베딩 (캐시 + embed_queue 배칭을 그대로 사용)"""
+    return list(await asyncio.gather(*(get_embedding(t) for t in texts)))
+
+
 # 컬렉션 생성 또는 가져오기
 def ensure_collection(collection_name: str, dimension: int = 1024):
     """컬렉션이 없으면 생성 (auto_id, 동적 필드 활성화)"""
+    if collection_name in _known_collections:
+        return
     client = get_milvus_client()
     if not client.has_collection(collection_name):
-        client.create_collection(
-            collection_name=collection_name,
-            dimension=dimension,
-            auto_id=True,                 # PK 자동 생성
-            primary_field="id",
-            id_type="int",                # MilvusClient: "int" or "str"
-            enable_dynamic_field=True,    # content, metadata 등 임의 필드 허용
-            metric_type="COSINE",
-        )
+        if VECTOR_DTYPE in ("fp16", "int8"):
+            _create_quantized_collection(client, collection_name, dimension)
+            _collection_dtypes[collection_name] = np.float16 if VECTOR_DTYPE == "fp16" else np.float32
+            _collection_search_param_cache[collection_name] = {"params": {"nprobe": SEARCH_NPROBE}}
+        else:
+            client.create_collection(
+                collection_name=collection_name,
+                dimension=dimension,
+                auto_id=True,                 # PK 자동 생성
+                primary_field="id",
+                id_type="int",                # MilvusClient: "int" or "str"
+                enable_dynamic_field=True,    # content, metadata 등 임의 필드 허용
+                metric_type="COSINE",
+            )
+    _known_collections.add(collection_name)
+
+
+def _collection_vector_dtype(collection_name: str):
+    """컬렉션 스키마의 벡터 필드 타입에 맞는 numpy dtype (FLOAT16_VECTOR면 float16, 그 외 float32)"""
+    dtype = _collection_dtypes.get(collection_name)
+    if dtype is None:
+        info = get_milvus_client().describe_collection(collection_name)
+        dtype = np.float32
+        for field in info.get("fields", []):
+            if field.get("type") == DataType.FLOAT16_VECTOR:
+                dtype = np.float16
+                break
+        _collection_dtypes[collection_name] = dtype
+    return dtype
+
+
+def _collection_search_params(collection_name: str) -> dict:
+    """컬렉션 인덱스가 IVF 계열이면 nprobe=SEARCH_NPROBE를 담은 search_params, 아니면 빈 dict"""
+    params = _collection_search_param_cache.get(collection_name)
+    if params is None:
+        client = get_milvus_client()
+        params = {}
+        for index_name in client.list_indexes(collection_name):
+            info = client.describe_index(collection_name, index_name) or {}
+            if str(info.get("index_type", "")).upper().startswith("IVF"):
+                params = {"params": {"nprobe": SEARCH_NPROBE}}
+                break
+        _collection_search_param_cache[collection_name] = params
+    return params
+
+
+def _search_options(collection_name: str):
+    """검색에 필요한 (벡터 dtype, search_params)를 한 번의 스레드풀 호출로"""
+    return _collection_vector_dtype(collection_name), _collection_search_params(collection_name)
+
+
+def _cast_rows(collection_name: str, data: list) -> list:
+    """삽입할 행의 벡터를 컬렉션 dtype으로 (float32 컬렉션이면 복사 없음)"""
+    dtype = _collection_vector_dtype(collection_name)
+    for row in data:
+        row["vector"] = row["vector"].astype(dtype, copy=False)
+    return data
+
+
+async def _insert_rows(collection_name: str, dimension: int, data: list):
+    """컬렉션 확인/생성 후 삽입. 캐시로 건너뛴 컬렉션이 실제로는 삭제된 경우 다시 만들고 한 번 재시도"""
+    client = get_milvus_client()
+    await _run_milvus(ensure_collection, collection_name, dimension=dimension)
+    try:
+        await _run_milvus(_cast_rows, collection_name, data)
+        return await _run_milvus(client.insert, collection_name=collection_name, data=data)
+    except Exception:
+        if collection_name not in _known_collections:
+            raise
+        _forget_collection(collection_name)
+        if await _run_milvus(client.has_collection, collection_name):
+            raise  # 컬렉션은 있음: 캐시 문제가 아님
+        await _run_milvus(ensure_collection, collection_name, dimension=dimension)
+        await _run_milvus(_cast_rows, collection_name, data)
+        return await _run_milvus(client.insert, collection_name=collection_name, data=data)
+
+
+def _create_quantized_collection(client, collection_name: str, dimension: int):
+    """VECTOR_DTYPE=fp16/int8용 컬렉션 생성 (스키마 + IVF_SQ8 인덱스 직접 지정)"""
+    schema = MilvusClient.create_schema(auto_id=True, enable_dynamic_field=True)
+    schema.add_field(field_name="id", datatype=DataType.INT64, is_primary=True)
+    vector_type = DataType.FLOAT16_VECTOR if VECTOR_DTYPE == "fp16" else DataType.FLOAT_VECTOR
+    schema.add_field(field_name="vector", datatype=vector_type, dim=dimension)
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(
+        field_name="vector",
+        index_type="IVF_SQ8",
+        metric_type="COSINE",
+        params={"nlist": IVF_NLIST},
+    )
+    client.create_collection(
+        collection_name=collection_name,
+        schema=schema,
+        index_params=index_params,
+    )
 
 
 @app.get("/")
@@ -142,6 +441,7 @@ def root():
         "message": "Milvus Lite Vector Search API",
         "endpoints": {
             "insert": "POST /insert",
+            "insert_batch": "POST /insert_batch",
             "search": "POST /search",
             "collections": "GET /collections",
             "health": "GET /health"
@@ -149,32 +449,37 @@ def root():
     }
 
 
-@app.get("/health")
-def health_check():
-    """전체 시스템 헬스체크"""
-    health_status = {
-        "api": "ok",
-        "llama_server": "unknown",
-        "milvus": "unknown"
-    }
-
-    # llama.cpp 서버 체크
+async def _check_llama() -> str:
+    """llama.cpp 서버 체크"""
     try:
-        resp = requests.get(f"{LLAMA_SERVER_URL}/health", timeout=5)
+        resp = await _http.get("/health", timeout=5)
         if resp.status_code == 200:
-            health_status["llama_server"] = "ok"
-        else:
-            health_status["llama_server"] = f"error: status {resp.status_code}"
+            return "ok"
+        return f"error: status {resp.status_code}"
     except Exception as e:
-        health_status["llama_server"] = f"error: {str(e)}"
+        return f"error: {str(e)}"
+
 
-    # Milvus 체크
+async def _check_milvus() -> str:
+    """Milvus 체크"""
     try:
         client = get_milvus_client()
-        client.list_collections()
-        health_status["milvus"] = "ok"
+        await _run_milvus(client.list_collections)
+        return "ok"
     except Exception as e:
-        health_status["milvus"] = f"error: {str(e)}"
+        return f"error: {str(e)}"
+
+
+@app.get("/health")
+async def health_check():
+    """전체 시스템 헬스체크"""
+    # 두 체크는 서로 독립적이므로 동시에 실행 (최악의 경우 대기 시간이 타임아웃 1회분)
+    llama_status, milvus_status = await asyncio.gather(_check_llama(), _check_milvus())
+    health_status = {
+        "api": "ok",
+        "llama_server": llama_status,
+        "milvus": milvus_status
+    }
 
     # 전체 상태 판단
     all_ok = all(v == "ok" for v in health_status.values())
@@ -186,7 +491,7 @@ def health_check():
 
 
 @app.post("/insert")
-def insert_data(request: InsertRequest):
+async def insert_data(request: InsertRequest):
     """
     데이터 삽입
     - db_name: 컬렉션 이름
@@ -194,16 +499,11 @@ def insert_data(request: InsertRequest):
     - metadata: 추가 메타데이터 (선택, dict)
     """
     try:
-        client = get_milvus_client()
-
         # 임베딩 생성
-        embedding = get_embedding(request.content)
-        if not embedding or len(embedding) == 0:
+        embedding = await get_embedding(request.content)
+        if embedding is None or len(embedding) == 0:
             raise ValueError("임베딩 벡터가 비어있습니다")
 
-        # 컬렉션 확인/생성 (차원 동기화)
-        ensure_collection(request.db_name, dimension=len(embedding))
-
         # 데이터 준비 (id는 자동 생성, metadata는 JSON으로 그대로)
         data = [{
             "vector": embedding,
@@ -211,11 +511,8 @@ def insert_data(request: InsertRequest):
             "metadata": request.metadata or {}
         }]
 
-        # 삽입
-        result = client.insert(
-            collection_name=request.db_name,
-            data=data
-        )
+        # 컬렉션 확인/생성 (차원 동기화) + 삽입
+        result = await _insert_rows(request.db_name, len(embedding), data)
 
         ids_raw = None
         if isinstance(result, dict) and "ids" in result:
@@ -243,8 +540,60 @@ def insert_data(request: InsertRequest):
         raise HTTPException(status_code=500, detail=f"삽입 실패: {error_detail}")
 
 
+@app.post("/insert_batch")
+async def insert_batch(request: InsertBatchRequest):
+    """
+    여러 건 일괄 삽입 (임베딩은 묶어서 생성, Milvus insert는 한 번)
+    - db_name: 컬렉션 이름
+    - items: [{content, metadata}, ...]
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items가 비어있습니다")
+
+    try:
+        # 임베딩 생성
+        embeddings = await embed_many([item.content for item in request.items])
+        dimension = len(embeddings[0])
+        if any(len(e) != dimension for e in embeddings):
+            raise ValueError("임베딩 차원이 일치하지 않습니다")
+
+        data = [{
+            "vector": embedding,
+            "content": item.content,
+            "metadata": item.metadata or {}
+        } for item, embedding in zip(request.items, embeddings)]
+
+        # 컬렉션 확인/생성 (차원 동기화) + 삽입 (한 번의 RPC)
+        result = await _insert_rows(request.db_name, dimension, data)
+
+        ids_raw = None
+        if isinstance(result, dict) and "ids" in result:
+            ids_raw = result.get("ids")
+        elif isinstance(result, list):
+            ids_raw = result
+        else:
+            ids_raw = [result]
+
+        ids = _to_json_ids(ids_raw)
+
+        return {
+            "status": "success",
+            "message": f"{len(ids)}건의 데이터가 '{request.db_name}'에 저장되었습니다",
+            "insert_count": len(ids),
+            "ids": ids,
+            "embedding_dimension": dimension
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        error_detail = f"{type(e).__name__}: {str(e)}\n\n{traceback.format_exc()}"
+        raise HTTPException(status_code=500, detail=f"일괄 삽입 실패: {error_detail}")
+
+
 @app.post("/search", response_model=List[SearchResult])
-def search_data(request: SearchRequest):
+async def search_data(request: SearchRequest):
     """
     유사도 검색
     - db_name: 검색할 컬렉션 이름
@@ -255,22 +604,38 @@ def search_data(request: SearchRequest):
         client = get_milvus_client()
 
         # 컬렉션 존재 확인
-        if not client.has_collection(request.db_name):
-            raise HTTPException(
-                status_code=404,
-                detail=f"컬렉션 '{request.db_name}'을 찾을 수 없습니다"
-            )
+        if request.db_name not in _known_collections:
+            if not await _run_milvus(client.has_collection, request.db_name):
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"컬렉션 '{request.db_name}'을 찾을 수 없습니다"
+                )
+            _known_collections.add(request.db_name)
 
         # 쿼리 임베딩 생성
-        query_embedding = get_embedding(request.query)
-
-        # 검색
-        results = client.search(
-            collection_name=request.db_name,
-            data=[query_embedding],
-            limit=request.k,
-            output_fields=["content", "metadata"]
-        )
+        query_embedding = await get_embedding(request.query)
+
+        # 검색 (pymilvus는 동기 API라 스레드풀에서 실행)
+        try:
+            # 쿼리 벡터도 컬렉션 스키마의 벡터 타입에 맞추고, IVF 인덱스면 nprobe 지정
+            dtype, search_params = await _run_milvus(_search_options, request.db_name)
+            results = await _run_milvus(
+                client.search,
+                collection_name=request.db_name,
+                data=query_embedding.astype(dtype, copy=False)[np.newaxis, :],
+                limit=request.k,
+                search_params=search_params,
+                output_fields=["content", "metadata"]
+            )
+        except Exception:
+            # 캐시에 남아 있던 컬렉션이 다른 워커/클라이언트에서 삭제됐으면 404
+            _forget_collection(request.db_name)
+            if not await _run_milvus(client.has_collection, request.db_name):
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"컬렉션 '{request.db_name}'을 찾을 수 없습니다"
+                )
+            raise
 
         # 결과 포맷팅
         formatted_results = []
@@ -288,14 +653,15 @@ def search_data(request: SearchRequest):
                 except Exception:
                     distance = 0.0
 
-            result = SearchResult(
-                content=content,
-                score=distance,
-                metadata=metadata if isinstance(metadata, dict) else None
-            )
-            formatted_results.append(result)
+            # SearchResult 형태의 dict를 바로 만든다 (Pydantic 검증/재직렬화 생략)
+            formatted_results.append({
+                "content": content,
+                "score": distance,
+                "metadata": metadata if isinstance(metadata, dict) else None
+            })
 
-        return formatted_results
+        # Response를 직접 반환하면 response_model 검증을 건너뜀 (스키마 문서는 유지)
+        return ORJSONResponse(content=formatted_results)
 
     except HTTPException:
         raise
@@ -304,11 +670,11 @@ def search_data(request: SearchRequest):
 
 
 @app.get("/collections")
-def list_collections():
+async def list_collections():
     """모든 컬렉션 목록 조회"""
     try:
         client = get_milvus_client()
-        collections = client.list_collections()
+        collections = await _run_milvus(client.list_collections)
         return {
             "collections": collections,
             "count": len(collections)
@@ -318,18 +684,19 @@ def list_collections():
 
 
 @app.delete("/collections/{collection_name}")
-def delete_collection(collection_name: str):
+async def delete_collection(collection_name: str):
     """컬렉션 삭제"""
     try:
         client = get_milvus_client()
 
-        if not client.has_collection(collection_name):
+        if not await _run_milvus(client.has_collection, collection_name):
             raise HTTPException(
                 status_code=404,
                 detail=f"컬렉션 '{collection_name}'을 찾을 수 없습니다"
             )
 
-        client.drop_collection(collection_name)
+        await _run_milvus(client.drop_collection, collection_name)
+        _forget_collection(collection_name)
         return {
             "status": "success",
             "message": f"컬렉션 '{collection_name}'이 삭제되었습니다"
@@ -342,4 +709,8 @@ def delete_collection(collection_name: str):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # loop/http "auto": uvicorn[standard]가 설치돼 있으면 uvloop + httptools 사용
+    if WEB_CONCURRENCY > 1 and not MILVUS_URI:
+        print("⚠️ Milvus Lite는 멀티 워커를 지원하지 않아 WEB_CONCURRENCY=1로 실행합니다 (MILVUS_URI 설정 필요)")
+    workers = WEB_CONCURRENCY if MILVUS_URI else 1
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, workers=workers, loop="auto", http="auto")
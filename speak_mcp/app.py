@@ -1,7 +1,10 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import json
+import io
+import re
 from pathlib import Path
 import time
 
@@ -19,34 +22,58 @@ st.set_page_config(page_title="Fish TTS Manager", layout="wide")
 VOICES_DIR.mkdir(parents=True, exist_ok=True)
 
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session for the TTS server (survives Streamlit reruns)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data
+def _load_voices_config_cached(mtime_ns: int, size: int) -> dict:
+    """Parse the config file; cache key is the file's (mtime, size) so writes invalidate it."""
+    with open(VOICES_CONFIG_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 def load_voices_config() -> dict:
     """Load voices configuration from JSON file."""
-    if VOICES_CONFIG_FILE.exists():
-        try:
-            with open(VOICES_CONFIG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Failed to load config: {e}")
+    try:
+        stat = VOICES_CONFIG_FILE.stat()
+    except FileNotFoundError:
+        return {"voices": {}}
+    try:
+        return _load_voices_config_cached(stat.st_mtime_ns, stat.st_size)
+    except Exception as e:
+        st.error(f"Failed to load config: {e}")
     return {"voices": {}}
 
 
 def save_voices_config(config: dict):
-    """Save voices configuration to JSON file."""
+    """Save voices configuration to JSON file (write temp file, then atomic rename)."""
+    tmp_path = VOICES_CONFIG_FILE.with_suffix(".json.tmp")
     try:
-        with open(VOICES_CONFIG_FILE, "w", encoding="utf-8") as f:
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, VOICES_CONFIG_FILE)
     except Exception as e:
         st.error(f"Failed to save config: {e}")
 
 
+@st.cache_data
+def _list_voices_cached(dir_mtime_ns: int) -> list:
+    """List wav stems; cache key is the directory mtime (changes on add/delete)."""
+    return sorted(f.stem for f in VOICES_DIR.iterdir() if f.suffix == ".wav")
+
+
 def get_voices():
     """Return list of voice IDs (based on wav files)."""
     if not VOICES_DIR.exists():
         VOICES_DIR.mkdir(exist_ok=True)
-    voices = []
-    for f in VOICES_DIR.glob("*.wav"):
-        voices.append(f.stem)
-    return sorted(voices)
+    return _list_voices_cached(VOICES_DIR.stat().st_mtime_ns)
 
 
 def get_voice_data(voice_id: str) -> dict:
@@ -60,15 +87,20 @@ def get_voice_data(voice_id: str) -> dict:
     })
 
 
+# Anything other than letters, digits and spaces (\w also matches "_", so drop it explicitly)
+_UNSAFE_NAME_CHARS = re.compile(r"[^\w ]|_")
+
+
 def save_voice(name: str, file_data, language: str, reference_text: str, persona: str, expose: bool):
     """Save a new voice with all metadata."""
     # Sanitize name
-    safe_name = "".join([c for c in name if c.isalpha() or c.isdigit() or c == ' ']).strip().replace(" ", "_")
+    safe_name = _UNSAFE_NAME_CHARS.sub("", name).strip().replace(" ", "_")
     filename = f"{safe_name}.wav"
     
     # Save Audio file
     with open(VOICES_DIR / filename, "wb") as f:
         f.write(file_data.getvalue())
+    _registered_voices().pop(safe_name, None)
     
     # Update config
     config = load_voices_config()
@@ -99,12 +131,26 @@ def update_voice_settings(voice_id: str, language: str, reference_text: str, per
     save_voices_config(config)
 
 
+def set_expose_flags(changes: dict):
+    """Apply several {voice_id: expose} changes with a single config write."""
+    config = load_voices_config()
+    voices_cfg = config.setdefault("voices", {})
+    for voice_id, expose in changes.items():
+        voices_cfg.setdefault(voice_id, {
+            "language": "",
+            "reference_text": "",
+            "persona": "",
+        })["expose"] = expose
+    save_voices_config(config)
+
+
 def delete_voice(voice_id: str):
     """Delete a voice and its config."""
     # Delete wav file
     voice_path = VOICES_DIR / f"{voice_id}.wav"
     if voice_path.exists():
         voice_path.unlink()
+    _registered_voices().pop(voice_id, None)
     
     # Remove from config
     config = load_voices_config()
@@ -113,6 +159,18 @@ def delete_voice(voice_id: str):
         save_voices_config(config)
 
 
+@st.cache_resource
+def _registered_voices() -> dict:
+    """voice_id -> (wav mtime_ns, reference_text) already registered with the TTS server."""
+    return {}
+
+
+@st.cache_resource(max_entries=32)
+def _reference_bytes(voice_id: str, mtime_ns: int) -> bytes:
+    """Reference wav contents, re-read only when the file changes."""
+    return (VOICES_DIR / f"{voice_id}.wav").read_bytes()
+
+
 def generate_audio(text: str, voice_id: str):
     """Generate and play audio directly in browser."""
     try:
@@ -120,11 +178,18 @@ def generate_audio(text: str, voice_id: str):
         voice_path = VOICES_DIR / f"{voice_id}.wav"
         voice_data = get_voice_data(voice_id)
         
-        if voice_path.exists():
+        if not voice_path.exists():
+            st.error(f"Voice file {voice_id} not found.")
+            return None
+
+        mtime_ns = voice_path.stat().st_mtime_ns
+        reg_signature = (mtime_ns, voice_data.get("reference_text", ""))
+        if _registered_voices().get(voice_id) != reg_signature:
             ref_url = TTS_API_URL.replace("/v1/tts", "/v1/references/add")
             
+            ref_bytes = _reference_bytes(voice_id, mtime_ns)
             files = {
-                "audio": (voice_path.name, open(voice_path, "rb"), "audio/wav")
+                "audio": (voice_path.name, io.BytesIO(ref_bytes), "audio/wav")
             }
             data = {
                 "id": voice_id,
@@ -132,15 +197,15 @@ def generate_audio(text: str, voice_id: str):
             }
             
             try:
-                reg_response = requests.post(ref_url, data=data, files=files, timeout=30)
-                if reg_response.status_code not in [200, 201, 409, 422]:
+                reg_response = get_http_session().post(ref_url, data=data, files=files, timeout=30)
+                # 422 is a warning, not a failure: remember it too so it is not resent on every click
+                if reg_response.status_code in (200, 201, 409, 422):
+                    _registered_voices()[voice_id] = reg_signature
+                else:
                     st.warning(f"Voice registration warning: {reg_response.status_code}")
             except Exception as e:
                 st.error(f"Failed to register voice: {e}")
                 return None
-        else:
-            st.error(f"Voice file {voice_id} not found.")
-            return None
 
         # 2. Generate Speech
         payload = {
@@ -153,9 +218,11 @@ def generate_audio(text: str, voice_id: str):
             "reference_id": voice_id
         }
         
-        response = requests.post(TTS_API_URL, json=payload, timeout=120)
+        response = get_http_session().post(TTS_API_URL, json=payload, timeout=120)
 
         if response.status_code != 200:
+            # The server may have lost the reference (e.g. restarted): register again next time
+            _registered_voices().pop(voice_id, None)
             st.error(f"TTS Error: {response.status_code} - {response.text}")
             return None
         
@@ -245,13 +312,14 @@ with tab2:
     else:
         # Quick toggle section
         st.markdown("### Quick Expose Toggle")
-        st.markdown("Control which voices are exposed as MCP tools:")
+        st.markdown("Control which voices are exposed as MCP tools (click **Apply** to save):")
         
         config = load_voices_config()
         cols = st.columns(4)
+        pending_expose = {}
         
         for i, voice_id in enumerate(voices):
-            voice_data = get_voice_data(voice_id)
+            voice_data = config.get("voices", {}).get(voice_id, {})
             col = cols[i % 4]
             
             with col:
@@ -262,16 +330,19 @@ with tab2:
                     key=f"expose_{voice_id}"
                 )
                 
-                # Auto-save on change
+                # Collect changes; they are written together with the Apply button
                 if new_expose != current_expose:
-                    update_voice_settings(
-                        voice_id,
-                        voice_data.get("language", ""),
-                        voice_data.get("reference_text", ""),
-                        voice_data.get("persona", ""),
-                        new_expose
-                    )
-                    st.rerun()
+                    pending_expose[voice_id] = new_expose
+        
+        if pending_expose:
+            apply_col, hint_col = st.columns([1, 3])
+            with apply_col:
+                apply_clicked = st.button(f"💾 Apply ({len(pending_expose)} changed)", key="apply_expose")
+            with hint_col:
+                st.caption(f"⚠️ {len(pending_expose)} unsaved change(s) — not saved until you click Apply")
+            if apply_clicked:
+                set_expose_flags(pending_expose)
+                st.rerun()
         
         st.markdown("---")
         
@@ -4,22 +4,138 @@ Fish TTS Audio Player - Enhanced Visualization
 import tkinter as tk
 from tkinter import ttk
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import json
 import queue
 import time
 import numpy as np
-import pyaudio
+import sounddevice as sd
 from aiohttp import web
 import requests
+from requests.adapters import HTTPAdapter
+import math
 from collections import deque
 
+try:
+    from numba import njit  # Optional: JIT kernel for the meter level
+except ImportError:
+    njit = None
+
 # Configuration
 HTTP_PORT = 5000
 CHUNK_SIZE = 1024
-FORMAT = pyaudio.paInt16
+DTYPE = 'int16'
 CHANNELS = 1
 RATE = 44100
+# Waveform colors: silence / soft (>0.1) / medium (>0.4) / loud (>0.7)
+WAVE_BG = np.array([0x16, 0x24, 0x47], dtype=np.uint8)
+WAVE_LEVELS = np.array([0.1, 0.4, 0.7], dtype=np.float32)
+WAVE_COLORS = np.array([[0x1f, 0x40, 0x68], [0x5d, 0xfd, 0xcb],
+                        [0xfe, 0xca, 0x57], [0xff, 0x6b, 0x9d]], dtype=np.uint8)
+WAVE_DRAW_EVERY = 2  # redraw the waveform every 2nd UI tick (meter/status every tick)
+SIGNAL_MIN_DELTA = 0.02     # signal changes smaller than this ...
+SIGNAL_MIN_INTERVAL = 0.1   # ... are sent at most every 100 ms
+HISTORY_LEN = 50  # signal samples shown across the waveform
+RING_BYTES = 1 << 22  # ~47 s of 44.1 kHz mono int16 buffered between HTTP and playback
+MAX_BACKLOG_BYTES = RATE * 2 * CHANNELS * 30  # beyond ~30 s of backlog, drop whole older utterances (never the newest)
+NET_READ_SIZE = 16384  # multipart read size (independent of the playback chunk size)
+RMS_WINDOW_BYTES = CHUNK_SIZE * 4  # play and meter up to 4 chunks per ring read
+
+RMS_FULL_SCALE = 12000.0  # Typical speech RMS: 1000-15000
+RMS_STRIDE = 8  # decimation for the visual level only (never applied to playback)
+
+def _level_numpy(audio_data):
+    """(rms, normalized) with NumPy; exact int64 sum of squares, one scalar sqrt"""
+    sum_squares = int(np.square(audio_data, dtype=np.int64).sum())
+    rms = math.sqrt(sum_squares / len(audio_data))
+    return rms, min(rms / RMS_FULL_SCALE, 1.0)
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _level_kernel(audio_data):
+        """(rms, normalized) in one fused loop, no temporaries"""
+        total = 0.0
+        for v in audio_data:
+            total += float(v) * float(v)
+        rms = math.sqrt(total / len(audio_data))
+        return rms, min(rms / RMS_FULL_SCALE, 1.0)
+else:
+    _level_kernel = _level_numpy
+
+def compute_level(pcm):
+    """(rms, normalized 0..1) of int16 PCM bytes; (0.0, 0.0) for empty input"""
+    # Every RMS_STRIDE-th sample is plenty for a meter (strided view, no copy)
+    audio_data = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)[::RMS_STRIDE]
+    if len(audio_data) == 0:
+        return 0.0, 0.0
+    return _level_kernel(audio_data)
+
+class PcmRing:
+    """Preallocated PCM byte ring: the HTTP side copies in, the audio thread reads slices in place"""
+    def __init__(self, size):
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.size = size
+        self.head = 0   # next byte to read
+        self.count = 0  # bytes buffered
+        self.read_total = 0  # bytes consumed or dropped since start (absolute read position)
+        self.starts = deque()  # absolute start positions of queued utterances
+        self.cond = threading.Condition()
+
+    def mark_utterance(self):
+        """Record that the next write begins a new utterance"""
+        with self.cond:
+            self.starts.append(self.read_total + self.count)
+
+    def write(self, data):
+        """Copy data into the ring, blocking while it is full (backpressure to the uploader)"""
+        data = memoryview(data)
+        with self.cond:
+            while len(data):
+                while self.count == self.size:
+                    self.cond.wait()
+                tail = (self.head + self.count) % self.size
+                n = min(len(data), self.size - self.count, self.size - tail)
+                self.view[tail:tail + n] = data[:n]
+                self.count += n
+                data = data[n:]
+                self.cond.notify_all()
+
+    def peek(self, max_bytes, timeout):
+        """Contiguous slice of up to max_bytes (whole samples); raises queue.Empty on timeout"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.count >= 2, timeout):
+                raise queue.Empty
+            n = min(self.count, max_bytes, self.size - self.head) & ~1
+            return self.view[self.head:self.head + n]
+
+    def drop_old_utterances(self, keep):
+        """While more than keep bytes are buffered, skip to the next queued utterance (audio thread only).
+
+        Only whole older utterances are dropped, so one long utterance is never cut; returns bytes dropped.
+        """
+        dropped = 0
+        with self.cond:
+            while self.starts and self.starts[0] <= self.read_total:
+                self.starts.popleft()
+            while self.count > keep and self.starts:
+                drop = self.starts.popleft() - self.read_total
+                self.head = (self.head + drop) % self.size
+                self.count -= drop
+                self.read_total += drop
+                dropped += drop
+            if dropped:
+                self.cond.notify_all()
+        return dropped
+
+    def consume(self, n):
+        """Release n bytes returned by peek() back to the writer"""
+        with self.cond:
+            self.head = (self.head + n) % self.size
+            self.count -= n
+            self.read_total += n
+            self.cond.notify_all()
 
 class AudioPlayerApp:
     def __init__(self):
@@ -28,18 +144,27 @@ class AudioPlayerApp:
         self.root.geometry("600x500")
         self.root.configure(bg='#0a0e27')  # Deep blue dark mode
         
-        self.audio_queue = queue.Queue()
+        self.audio_ring = PcmRing(RING_BYTES)
         self.signal_target_url = None
+        
+        # Signal POSTs go through one worker thread on a keep-alive session
+        self.signal_session = requests.Session()
+        self.signal_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.signal_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.signal_q = queue.Queue(maxsize=8)
         self.is_playing = False
         
         # Signal history for smoother visualization
-        self.signal_history = deque(maxlen=50)
+        # Fixed float32 ring (oldest entry at _sig_pos), written by the audio thread
+        self.signal_history = np.zeros(HISTORY_LEN, dtype=np.float32)
+        self._sig_pos = 0
         self.current_signal = 0.0
         self.current_rms = 0.0
         
         self.setup_ui()
         self.start_server_thread()
         self.start_audio_thread()
+        self.start_signal_thread()
         
         # Periodic UI update
         self.root.after(30, self.update_ui)
@@ -76,22 +201,30 @@ class AudioPlayerApp:
                                      bg="#162447", highlightthickness=2, highlightbackground="#1f4068")
         self.wave_canvas.pack()
         
-        # Initialize waveform bars
+        # Initialize waveform bars (drawn into one image, see draw_waveform)
         self.num_bars = 40
         self.bar_width = self.wave_width // self.num_bars - 2
-        self.bars = []
+        self._idle_drawn = False
+        self._ui_tick = 0
+        
+        self.wave_img = tk.PhotoImage(width=self.wave_width, height=self.wave_height)
+        self.wave_canvas.create_image(0, 0, anchor="nw", image=self.wave_img)
         
+        # Pixel columns covered by bars and which bar each column belongs to
+        bar_cols, col_bar = [], []
         for i in range(self.num_bars):
             x1 = i * (self.bar_width + 2) + 5
             x2 = x1 + self.bar_width
-            y1 = self.wave_height // 2
-            y2 = self.wave_height // 2
-            
-            bar = self.wave_canvas.create_rectangle(
-                x1, y1, x2, y2,
-                fill="#5dfdcb", outline=""
-            )
-            self.bars.append(bar)
+            bar_cols.extend(range(x1, x2))
+            col_bar.extend([i] * (x2 - x1))
+        self._bar_cols = np.array(bar_cols)
+        self._col_bar = np.array(col_bar)
+        self._bar_hist_idx = (np.arange(self.num_bars) * HISTORY_LEN) // self.num_bars
+        # Distance of each pixel row from the center line, shape (H, 1)
+        self._row_dist = np.abs(np.arange(self.wave_height) - self.wave_height // 2)[:, None]
+        self._wave_frame = np.empty((self.wave_height, self.wave_width, 3), dtype=np.uint8)
+        self._wave_frame[:] = WAVE_BG
+        self._ppm_header = f"P6 {self.wave_width} {self.wave_height} 255\n".encode()
         
         # Center line
         self.wave_canvas.create_line(
@@ -116,8 +249,12 @@ class AudioPlayerApp:
             fill="#5dfdcb", outline=""
         )
         
+        self._last_meter_w = 0
+        self._last_meter_color = "#5dfdcb"
+        
         # Volume percentage
         self.volume_var = tk.StringVar(value="0%")
+        self._last_percentage = 0
         ttk.Label(meter_frame, textvariable=self.volume_var, 
                  font=("Segoe UI", 9, "bold"), foreground="#5dfdcb").pack()
         
@@ -141,14 +278,16 @@ class AudioPlayerApp:
     def run_server(self):
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        # One helper thread for the blocking ring writes; handlers stay on this loop's thread
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiohttp-io"))
         
         app = web.Application()
         app.router.add_post('/play', self.handle_play)
         app.router.add_post('/set_signal_target', self.handle_set_target)
         
-        runner = web.AppRunner(app)
+        runner = web.AppRunner(app, access_log=None)
         loop.run_until_complete(runner.setup())
-        site = web.TCPSite(runner, '0.0.0.0', HTTP_PORT)
+        site = web.TCPSite(runner, '0.0.0.0', HTTP_PORT, backlog=128)
         loop.run_until_complete(site.start())
         print(f"✅ Server started on port {HTTP_PORT}")
         loop.run_forever()
@@ -159,13 +298,19 @@ class AudioPlayerApp:
             field = await reader.next()
             
             if field.name == 'audio':
+                loop = asyncio.get_running_loop()
+                self.audio_ring.mark_utterance()
                 total_bytes = 0
                 while True:
-                    chunk = await field.read_chunk(size=CHUNK_SIZE)
+                    chunk = await field.read_chunk(size=NET_READ_SIZE)
                     if not chunk:
                         break
                     total_bytes += len(chunk)
-                    self.audio_queue.put(chunk)
+                    # write() may block on a full ring, so keep it off the event loop
+                    await loop.run_in_executor(None, self.audio_ring.write, chunk)
+                if total_bytes % 2:
+                    # Pad to a whole sample so the next stream stays aligned
+                    await loop.run_in_executor(None, self.audio_ring.write, b"\x00")
                 
                 print(f"✅ Received {total_bytes} bytes")
                 return web.Response(text="Playback complete")
@@ -188,132 +333,134 @@ class AudioPlayerApp:
         threading.Thread(target=self.audio_processing_loop, daemon=True).start()
 
     def audio_processing_loop(self):
-        p = pyaudio.PyAudio()
-        stream = p.open(format=FORMAT, channels=CHANNELS, rate=RATE, output=True)
+        # Blocking write() waits inside PortAudio with the GIL released,
+        # so the aiohttp and Tk threads keep running during playback
+        stream = sd.OutputStream(samplerate=RATE, channels=CHANNELS, dtype=DTYPE,
+                                 blocksize=CHUNK_SIZE // 2, latency='high')
+        stream.start()
         print("🎵 Audio processing loop started")
         
+        dropped = 0
         while True:
             try:
-                chunk = self.audio_queue.get(timeout=0.1)
+                # Keep latency bounded: skip older queued utterances, never cut the current one
+                dropped += self.audio_ring.drop_old_utterances(MAX_BACKLOG_BYTES)
+                # One RMS window at a time, read in place from the ring
+                window = self.audio_ring.peek(RMS_WINDOW_BYTES, timeout=0.1)
                 self.is_playing = True
                 
-                # Play audio
-                stream.write(chunk)
-                
-                # Calculate RMS with NaN protection
+                # Play and meter the same memory (no bytes copy), then hand the space back
                 try:
-                    audio_data = np.frombuffer(chunk, dtype=np.int16)
-                    if len(audio_data) > 0:
-                        # Calculate RMS safely
-                        squared = audio_data.astype(np.float64) ** 2
-                        mean_squared = np.mean(squared)
-                        
-                        # Protect against NaN and inf
-                        if np.isfinite(mean_squared) and mean_squared >= 0:
-                            rms = np.sqrt(mean_squared)
-                            
-                            # Normalize with better scaling
-                            # Typical speech RMS: 1000-15000
-                            normalized_rms = min(max(rms / 12000.0, 0.0), 1.0)
-                            
-                            # Update with smoothing
-                            self.current_signal = normalized_rms
-                            self.current_rms = rms
-                            self.signal_history.append(normalized_rms)
-                        else:
-                            # Fallback to zero if calculation fails
-                            self.current_signal = 0.0
-                            self.current_rms = 0.0
-                            self.signal_history.append(0.0)
-                    else:
-                        self.current_signal = 0.0
-                        self.current_rms = 0.0
-                        self.signal_history.append(0.0)
-                        
-                except (ValueError, OverflowError) as e:
-                    print(f"⚠️ Audio calculation error: {e}")
-                    self.current_signal = 0.0
-                    self.current_rms = 0.0
-                    self.signal_history.append(0.0)
+                    stream.write(np.frombuffer(window, dtype=np.int16).reshape(-1, CHANNELS))
+                    try:
+                        rms, level = compute_level(window)
+                    except (ValueError, OverflowError) as e:
+                        print(f"⚠️ Audio calculation error: {e}")
+                        rms, level = 0.0, 0.0
+                finally:
+                    self.audio_ring.consume(len(window))
+                
+                self.current_signal = level
+                self.current_rms = rms
+                self.push_signal(self.current_signal)
                 
                 # Send Signal (if target configured)
                 if self.signal_target_url and np.isfinite(self.current_signal):
                     try:
-                        threading.Thread(
-                            target=requests.post, 
-                            args=(self.signal_target_url,),
-                            kwargs={'json': {'signal': float(self.current_signal)}, 'timeout': 1},
-                            daemon=True
-                        ).start()
-                    except Exception:
-                        pass
+                        self.signal_q.put_nowait((self.signal_target_url, {'signal': float(self.current_signal)}))
+                    except queue.Full:
+                        pass  # Signal is lossy; drop when the worker falls behind
                         
             except queue.Empty:
                 self.is_playing = False
+                if dropped:
+                    print(f"⚠️ Playback backlog too long, skipped {dropped} bytes of older utterances")
+                    dropped = 0
                 # Decay signal smoothly
                 if self.current_signal > 0.01:
                     self.current_signal *= 0.9
-                    self.signal_history.append(self.current_signal)
+                    self.push_signal(self.current_signal)
                 else:
                     self.current_signal = 0.0
                     self.current_rms = 0.0
-                    self.signal_history.append(0.0)
+                    self.push_signal(0.0)
                     
             except Exception as e:
                 print(f"❌ Audio Error: {e}")
 
+    def push_signal(self, value):
+        self.signal_history[self._sig_pos % HISTORY_LEN] = value
+        self._sig_pos += 1
+
+    def start_signal_thread(self):
+        threading.Thread(target=self.signal_loop, daemon=True).start()
+
+    def signal_loop(self):
+        last_value, last_sent = None, 0.0
+        while True:
+            url, payload = self.signal_q.get()
+            # Last value wins: skip anything older still waiting in the queue
+            while True:
+                try:
+                    url, payload = self.signal_q.get_nowait()
+                except queue.Empty:
+                    break
+            
+            # Rate limit near-duplicates (steady playback sends almost the same level)
+            now = time.monotonic()
+            if (last_value is not None and abs(payload['signal'] - last_value) < SIGNAL_MIN_DELTA
+                    and now - last_sent < SIGNAL_MIN_INTERVAL):
+                continue
+            try:
+                self.signal_session.post(url, json=payload, timeout=1)
+            except Exception:
+                pass
+            last_value, last_sent = payload['signal'], now
+
+    def draw_waveform(self):
+        """Render the waveform bars into a pixel buffer and blit it as one PPM image"""
+        # Map bar index to history (right to left, newest on right) in one gather;
+        # the ring offset is folded into the index, so no oldest-first copy is built
+        pos = self._sig_pos
+        bar_signals = self.signal_history[(self._bar_hist_idx + pos) % HISTORY_LEN]
+        
+        # Protect against NaN
+        bar_signals[~np.isfinite(bar_signals)] = 0.0
+        
+        # Bar half-height (symmetric around center) and color per bar
+        bar_heights = bar_signals * (self.wave_height / 2) * 0.8
+        bar_colors = WAVE_COLORS[np.digitize(bar_signals, WAVE_LEVELS, right=True)]
+        
+        # Fill every bar column at once: lit where the row is inside the bar
+        lit = self._row_dist < bar_heights[self._col_bar]
+        self._wave_frame[:, self._bar_cols] = np.where(lit[..., None], bar_colors[self._col_bar], WAVE_BG)
+        self.wave_img.configure(data=self._ppm_header + self._wave_frame.tobytes(), format="PPM")
+
     def update_ui(self):
         """Update visualization"""
+        # Nothing changes while idle: draw the silent frame once, then skip
+        idle = not self.is_playing and not self.signal_history.any()
+        if idle and self._idle_drawn:
+            self.root.after(30, self.update_ui)
+            return
+        self._idle_drawn = idle
+        
         try:
             # Get signal with NaN protection
             signal = self.current_signal if np.isfinite(self.current_signal) else 0.0
             signal = max(0.0, min(1.0, signal))  # Clamp to [0, 1]
             
-            # === Update Waveform Bars ===
-            history_list = list(self.signal_history)
-            
-            for i, bar in enumerate(self.bars):
-                # Map bar index to history (right to left, newest on right)
-                history_idx = int((i / self.num_bars) * len(history_list))
-                
-                if history_idx < len(history_list):
-                    bar_signal = history_list[history_idx]
-                else:
-                    bar_signal = 0.0
-                
-                # Protect against NaN
-                if not np.isfinite(bar_signal):
-                    bar_signal = 0.0
-                
-                # Calculate bar height (symmetric around center)
-                bar_height = bar_signal * (self.wave_height / 2) * 0.8
-                
-                center = self.wave_height // 2
-                y1 = center - bar_height
-                y2 = center + bar_height
-                
-                # Get bar position
-                coords = self.wave_canvas.coords(bar)
-                x1, x2 = coords[0], coords[2]
-                
-                # Update bar
-                self.wave_canvas.coords(bar, x1, y1, x2, y2)
-                
-                # Color gradient based on intensity
-                if bar_signal > 0.7:
-                    color = "#ff6b9d"  # Pink for loud
-                elif bar_signal > 0.4:
-                    color = "#feca57"  # Yellow for medium
-                elif bar_signal > 0.1:
-                    color = "#5dfdcb"  # Cyan for soft
-                else:
-                    color = "#1f4068"  # Dark for silence
-                
-                self.wave_canvas.itemconfig(bar, fill=color)
+            # === Update Waveform Bars (every WAVE_DRAW_EVERY ticks) ===
+            self._ui_tick += 1
+            if idle or self._ui_tick % WAVE_DRAW_EVERY == 0:  # always draw the final silent frame
+                self.draw_waveform()
             
             # === Update Volume Meter ===
-            meter_width = min(signal * 396, 396)
-            self.meter_canvas.coords(self.volume_bar, 2, 2, meter_width + 2, 28)
+            # Only touch the canvas / label when the value actually changes
+            meter_width = int(min(signal * 396, 396))
+            if meter_width != self._last_meter_w:
+                self.meter_canvas.coords(self.volume_bar, 2, 2, meter_width + 2, 28)
+                self._last_meter_w = meter_width
             
             # Color based on volume
             if signal > 0.8:
@@ -323,11 +470,15 @@ class AudioPlayerApp:
             else:
                 meter_color = "#5dfdcb"
             
-            self.meter_canvas.itemconfig(self.volume_bar, fill=meter_color)
+            if meter_color != self._last_meter_color:
+                self.meter_canvas.itemconfig(self.volume_bar, fill=meter_color)
+                self._last_meter_color = meter_color
             
             # Update percentage
             percentage = int(signal * 100)
-            self.volume_var.set(f"{percentage}%")
+            if percentage != self._last_percentage:
+                self.volume_var.set(f"{percentage}%")
+                self._last_percentage = percentage
             
             # === Update Status ===
             if self.is_playing:
@@ -3,28 +3,45 @@ Fish TTS MCP Server
 Dynamic voice-based TTS tools with persona support
 """
 import asyncio
+import atexit
+import base64
+import os
+import re
 import sys
+import queue
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 import logging
+import logging.handlers
 
 import httpx
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+try:
+    import orjson  # Optional: faster JSON for the config and request payloads
+except ImportError:
+    orjson = None
+
 # Logging configuration
-logging.basicConfig(
-    filename='mcp_server.log',
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+# The event loop only enqueues records; a QueueListener thread does the file/stderr writes
+file_handler = logging.FileHandler('mcp_server.log')
+file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
 
-# Add console handler (output to stderr)
+# Console handler (output to stderr)
 console = logging.StreamHandler(sys.stderr)
 console.setLevel(logging.INFO)
-logging.getLogger().addHandler(console)
+
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, file_handler, console, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logging.getLogger().setLevel(logging.DEBUG)
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
 
 # Configuration
 TTS_API_URL = "http://localhost:8088/v1/tts"
@@ -38,73 +55,213 @@ VOICES_CONFIG_FILE = SCRIPT_DIR / "voices_config.json"
 # Ensure voices directory exists
 VOICES_DIR.mkdir(parents=True, exist_ok=True)
 
-logging.info(f"=== Fish TTS MCP Server Starting ===")
-logging.info(f"Voices Directory: {VOICES_DIR.absolute()}")
-logging.info(f"Voices Config: {VOICES_CONFIG_FILE.absolute()}")
-logging.info(f"TTS API: {TTS_API_URL}")
-logging.info(f"Audio Player: {AUDIO_PLAYER_URL}")
+logging.info("=== Fish TTS MCP Server Starting ===")
+logging.info("Voices Directory: %s", VOICES_DIR.absolute())
+logging.info("Voices Config: %s", VOICES_CONFIG_FILE.absolute())
+logging.info("TTS API: %s", TTS_API_URL)
+logging.info("Audio Player: %s", AUDIO_PLAYER_URL)
 
 # Initialize MCP server
 app = Server("SpeakMCP")
 
+# Per-route request timeouts (seconds)
+HTTP_TIMEOUTS = {
+    "tts": 180.0,
+    "register": 30.0,
+    "player": 30.0,
+}
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=30.0)
+
+# Shared HTTP clients, one per host, so a stalled player can't evict TTS keep-alive sockets
+_tts_client = httpx.AsyncClient(timeout=HTTP_TIMEOUTS["tts"], limits=HTTP_LIMITS)
+_player_client = httpx.AsyncClient(timeout=HTTP_TIMEOUTS["player"], limits=HTTP_LIMITS)
+
+# The local Fish-TTS server saturates its GPU/CPU on one request; queue callers instead of contending
+TTS_CONCURRENCY = max(1, int(os.getenv("TTS_CONCURRENCY", "1")))
+_TTS_SEM = asyncio.Semaphore(TTS_CONCURRENCY)
+_tts_waiting = 0
+
+# In-flight background player uploads (kept referenced so they aren't GC'd, awaited on shutdown)
+_BG_TASKS: set[asyncio.Task] = set()
+PLAYER_UPLOAD_CONCURRENCY = 4
+PLAYER_SHUTDOWN_TIMEOUT = 10.0
+_PLAYER_SEM = asyncio.Semaphore(PLAYER_UPLOAD_CONCURRENCY)
+TTS_STREAM_CHUNK = 64 * 1024
+
+# Request payloads are pre-serialized (content=...), so the JSON content type is set by hand
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def json_dumps_bytes(obj) -> bytes:
+    """Serialize a request payload to UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Parsed voices config + tool_name -> voice_id map, keyed on the file's (mtime_ns, size)
+_config_cache = {"sig": None, "data": None, "tool_names": {}}
+
 
 def load_voices_config() -> dict:
-    """Load voices configuration from JSON file."""
-    if VOICES_CONFIG_FILE.exists():
-        try:
+    """Load voices configuration from JSON file (cached until the file changes)."""
+    try:
+        st = VOICES_CONFIG_FILE.stat()
+    except FileNotFoundError:
+        _config_cache.update(sig=None, data=None, tool_names={})
+        return {"voices": {}}
+    sig = (st.st_mtime_ns, st.st_size)
+    if sig == _config_cache["sig"]:
+        return _config_cache["data"]
+    
+    try:
+        if orjson is not None:
+            config = orjson.loads(VOICES_CONFIG_FILE.read_bytes())
+        else:
             with open(VOICES_CONFIG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            logging.error(f"Failed to load voices config: {e}")
-    return {"voices": {}}
+                config = json.load(f)
+    except Exception as e:
+        logging.error("Failed to load voices config: %s", e)
+        return {"voices": {}}
+    
+    tool_names = {}
+    for voice_id in config.get("voices", {}):
+        tool_names.setdefault(create_voice_tool_name(voice_id), voice_id)
+    _config_cache.update(sig=sig, data=config, tool_names=tool_names)
+    return config
+
+
+async def aload_voices_config() -> dict:
+    """load_voices_config() on a worker thread (stat + JSON parse stay off the event loop)."""
+    return await asyncio.to_thread(load_voices_config)
 
 
 def save_voices_config(config: dict):
     """Save voices configuration to JSON file."""
     try:
-        with open(VOICES_CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            VOICES_CONFIG_FILE.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(VOICES_CONFIG_FILE, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
     except Exception as e:
-        logging.error(f"Failed to save voices config: {e}")
+        logging.error("Failed to save voices config: %s", e)
+
+
+def list_voice_files() -> frozenset[str]:
+    """Voice ids that have a .wav in VOICES_DIR (one directory read instead of a stat per voice)."""
+    try:
+        with os.scandir(VOICES_DIR) as entries:
+            return frozenset(e.name[:-4] for e in entries if e.name.endswith(".wav") and e.is_file())
+    except FileNotFoundError:
+        return frozenset()
 
 
-def get_exposed_voices() -> dict:
+def get_exposed_voices(voice_files: frozenset[str] | None = None) -> dict:
     """Get only voices that are marked as exposed."""
     config = load_voices_config()
     voices = config.get("voices", {})
+    if voice_files is None:
+        voice_files = list_voice_files()
     
     exposed = {}
     for voice_id, voice_data in voices.items():
         # Check if voice file exists and is exposed
-        voice_path = VOICES_DIR / f"{voice_id}.wav"
-        if voice_path.exists() and voice_data.get("expose", False):
+        if voice_id in voice_files and voice_data.get("expose", False):
             exposed[voice_id] = voice_data
     
     return exposed
 
 
-async def send_to_player(audio_data: bytes, player_url: str):
+async def stream_to_player(tts_response: httpx.Response, player_url: str):
     """
-    Send audio to player in background (fire and forget).
-    This runs independently and doesn't block the main response.
+    Pipe an open (streamed) TTS response into the player's multipart upload in background.
+    The TTS download and player upload overlap; _TTS_SEM is released once the TTS body is drained.
     """
+    boundary = os.urandom(16).hex()
+    total_bytes = 0
+    tts_done = False
+    
+    async def finish_tts():
+        nonlocal tts_done
+        if not tts_done:
+            tts_done = True
+            await tts_response.aclose()
+            _TTS_SEM.release()
+    
+    async def multipart_body():
+        nonlocal total_bytes
+        yield (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="audio"; filename="speech.wav"\r\n'
+            "Content-Type: audio/wav\r\n\r\n"
+        ).encode()
+        try:
+            async for chunk in tts_response.aiter_bytes(TTS_STREAM_CHUNK):
+                total_bytes += len(chunk)
+                yield chunk
+        finally:
+            await finish_tts()
+        yield f"\r\n--{boundary}--\r\n".encode()
+    
     try:
-        player_files = {
-            'audio': ('speech.wav', audio_data, 'audio/wav')
-        }
+        logging.info("[Background] Streaming TTS audio to player: %s", player_url)
         
-        logging.info(f"[Background] Sending {len(audio_data)} bytes to player: {player_url}")
+        async with _PLAYER_SEM:
+            player_response = await _player_client.post(
+                player_url,
+                content=multipart_body(),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+            )
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            player_response = await client.post(player_url, files=player_files)
-            
-            if player_response.status_code == 200:
-                logging.info(f"[Background] ✅ Audio sent to player successfully")
-            else:
-                logging.error(f"[Background] Audio Player error: {player_response.status_code} - {player_response.text}")
+        if player_response.status_code == 200:
+            logging.info("[Background] ✅ Audio sent to player successfully (%s bytes)", total_bytes)
+        else:
+            logging.error("[Background] Audio Player error: %s - %s", player_response.status_code, player_response.text)
                 
     except Exception as e:
-        logging.error(f"[Background] Failed to send audio to player: {str(e)}", exc_info=True)
+        logging.error("[Background] Failed to send audio to player: %s", e, exc_info=True)
+    finally:
+        # The body may never have been iterated (e.g. player unreachable)
+        await finish_tts()
+
+
+# voice_id -> (wav mtime_ns, reference_text) already registered with the TTS server
+_registered_voices: dict[str, tuple[int, str]] = {}
+# voice_id -> (wav mtime_ns, base64 wav) for inline references, kept until the voice is registered
+_inline_references: dict[str, tuple[int, str]] = {}
+# voice_ids with a background registration in flight
+_registering: set[str] = set()
+
+
+async def get_voice_signature(voice_id: str) -> tuple[int, str] | None:
+    """(wav mtime_ns, reference_text) for a voice, or None if its wav is missing."""
+    voice_path = VOICES_DIR / f"{voice_id}.wav"
+    
+    try:
+        mtime_ns = (await asyncio.to_thread(voice_path.stat)).st_mtime_ns
+    except FileNotFoundError:
+        _registered_voices.pop(voice_id, None)
+        _inline_references.pop(voice_id, None)
+        return None
+    
+    # Load voice metadata from config
+    config = await aload_voices_config()
+    voice_data = config.get("voices", {}).get(voice_id, {})
+    return mtime_ns, voice_data.get("reference_text", "")
+
+
+async def get_inline_reference(voice_id: str, mtime_ns: int) -> str:
+    """Base64 of the voice wav for an inline "references" entry (encoded once per wav version)."""
+    cached = _inline_references.get(voice_id)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    
+    voice_path = VOICES_DIR / f"{voice_id}.wav"
+    audio_bytes = await asyncio.to_thread(voice_path.read_bytes)
+    audio_b64 = base64.b64encode(audio_bytes).decode('ascii')
+    _inline_references[voice_id] = (mtime_ns, audio_b64)
+    return audio_b64
 
 
 async def register_voice(voice_id: str) -> tuple[bool, str]:
@@ -114,74 +271,112 @@ async def register_voice(voice_id: str) -> tuple[bool, str]:
     """
     voice_path = VOICES_DIR / f"{voice_id}.wav"
     
-    if not voice_path.exists():
+    reg_signature = await get_voice_signature(voice_id)
+    if reg_signature is None:
         msg = f"Voice file '{voice_id}.wav' not found in voices directory."
         logging.error(msg)
         return False, msg
+    reference_text = reg_signature[1]
     
-    # Load voice metadata from config
-    config = load_voices_config()
-    voice_data = config.get("voices", {}).get(voice_id, {})
-    reference_text = voice_data.get("reference_text", "")
+    # Skip the upload if this exact wav + text is already registered
+    if _registered_voices.get(voice_id) == reg_signature:
+        return True, f"Voice '{voice_id}' already registered (cached)."
     
     ref_url = TTS_API_URL.replace("/v1/tts", "/v1/references/add")
     
-    logging.info(f"Registering voice: {voice_id}")
+    logging.info("Registering voice: %s", voice_id)
     
     try:
-        # Read audio file
-        with open(voice_path, "rb") as audio_file:
-            audio_data = audio_file.read()
-        
-        # Prepare multipart form data
-        files = {
-            "audio": (voice_path.name, audio_data, "audio/wav")
-        }
         data = {
             "id": voice_id,
             "text": reference_text
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(ref_url, data=data, files=files)
+        # Prepare multipart form data (httpx streams the open file in chunks, no full read)
+        audio_file = await asyncio.to_thread(open, voice_path, "rb")
+        with audio_file:
+            files = {
+                "audio": (voice_path.name, audio_file, "audio/wav")
+            }
+            response = await _tts_client.post(ref_url, data=data, files=files, timeout=HTTP_TIMEOUTS["register"])
+        
+        if response.status_code in [200, 201]:
+            _registered_voices[voice_id] = reg_signature
+            _inline_references.pop(voice_id, None)
+            msg = f"Voice '{voice_id}' registered successfully."
+            logging.info(msg)
+            return True, msg
+        elif response.status_code == 409:
+            _registered_voices[voice_id] = reg_signature
+            _inline_references.pop(voice_id, None)
+            msg = f"Voice '{voice_id}' already registered (using existing)."
+            logging.info(msg)
+            return True, msg
+        elif response.status_code == 422:
+            msg = f"Voice '{voice_id}' registration warning (proceeding anyway)"
+            logging.warning("%s: %s", msg, response.text)
+            return True, msg
+        else:
+            _registered_voices.pop(voice_id, None)
+            msg = f"Voice registration failed: {response.status_code} - {response.text}"
+            logging.error(msg)
+            return False, msg
             
-            if response.status_code in [200, 201]:
-                msg = f"Voice '{voice_id}' registered successfully."
-                logging.info(msg)
-                return True, msg
-            elif response.status_code == 409:
-                msg = f"Voice '{voice_id}' already registered (using existing)."
-                logging.info(msg)
-                return True, msg
-            elif response.status_code == 422:
-                msg = f"Voice '{voice_id}' registration warning (proceeding anyway)"
-                logging.warning(f"{msg}: {response.text}")
-                return True, msg
-            else:
-                msg = f"Voice registration failed: {response.status_code} - {response.text}"
-                logging.error(msg)
-                return False, msg
-                
     except Exception as e:
+        _registered_voices.pop(voice_id, None)
         msg = f"Failed to register voice: {str(e)}"
         logging.error(msg, exc_info=True)
         return False, msg
 
 
+async def register_voice_background(voice_id: str):
+    """Register a voice after it was first used inline, so later calls can send just reference_id.
+
+    Holds _TTS_SEM: the reference encode runs on the TTS GPU and must not overlap a synthesis.
+    """
+    _registering.add(voice_id)
+    try:
+        async with _TTS_SEM:
+            success, msg = await register_voice(voice_id)
+        logging.info("[Background] Voice registration: %s", msg)
+    finally:
+        _registering.discard(voice_id)
+
+
+def spawn_background(coro) -> asyncio.Task:
+    """Start a tracked background task (awaited on shutdown)."""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    return task
+
+
+# Every non-alphanumeric char (\W is exactly "not isalnum()" apart from '_' itself)
+_NON_ALNUM = re.compile(r"\W")
+
+
+@lru_cache(maxsize=256)
 def create_voice_tool_name(voice_id: str) -> str:
     """Create a tool name from voice ID."""
     # Sanitize: replace spaces and special chars with underscore
-    safe_name = "".join([c if c.isalnum() else "_" for c in voice_id])
+    safe_name = _NON_ALNUM.sub("_", voice_id)
     return f"{safe_name}_tts"
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """Return list of available tools - one per exposed voice."""
-    logging.debug("list_tools() called")
+# Built tool list, keyed on (config signature, wav files present)
+_tools_cache = {"sig": None, "tools": []}
+
+
+def build_tools() -> list[Tool]:
+    """Build the tool list - one per exposed voice (reused until config or voices dir changes)."""
+    load_voices_config()  # refreshes _config_cache["sig"]
+    voice_files = list_voice_files()
+    sig = (_config_cache["sig"], voice_files)
+    if sig == _tools_cache["sig"]:
+        return _tools_cache["tools"]
     
     tools = []
-    exposed_voices = get_exposed_voices()
+    exposed_voices = get_exposed_voices(voice_files)
     
     for voice_id, voice_data in exposed_voices.items():
         tool_name = create_voice_tool_name(voice_id)
@@ -206,7 +401,7 @@ async def list_tools() -> list[Tool]:
             }
         )
         tools.append(tool)
-        logging.debug(f"Added tool: {tool_name}")
+        logging.debug("Added tool: %s", tool_name)
     
     # If no voices are exposed, add a helper tool
     if not tools:
@@ -220,30 +415,36 @@ async def list_tools() -> list[Tool]:
             }
         ))
     
-    logging.info(f"Returning {len(tools)} tools: {[t.name for t in tools]}")
+    _tools_cache.update(sig=sig, tools=tools)
+    return tools
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """Return list of available tools - one per exposed voice."""
+    logging.debug("list_tools() called")
+    
+    tools = await asyncio.to_thread(build_tools)
+    
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info("Returning %s tools: %s", len(tools), [t.name for t in tools])
     return tools
 
 
-def extract_voice_id_from_tool_name(tool_name: str) -> str | None:
+async def extract_voice_id_from_tool_name(tool_name: str) -> str | None:
     """Extract voice_id from tool name (reverse of create_voice_tool_name)."""
     if not tool_name.endswith("_tts"):
         return None
     
-    # Find matching voice in config
-    config = load_voices_config()
-    voices = config.get("voices", {})
-    
-    for voice_id in voices.keys():
-        if create_voice_tool_name(voice_id) == tool_name:
-            return voice_id
-    
-    return None
+    # Find matching voice in config (map is rebuilt whenever the config reloads)
+    await aload_voices_config()
+    return _config_cache["tool_names"].get(tool_name)
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Execute tool"""
-    logging.info(f"call_tool() - name: {name}, arguments: {arguments}")
+    logging.info("call_tool() - name: %s, arguments: %s", name, arguments)
     
     try:
         # Handle placeholder tool
@@ -254,7 +455,7 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
             )]
         
         # Extract voice_id from tool name
-        voice_id = extract_voice_id_from_tool_name(name)
+        voice_id = await extract_voice_id_from_tool_name(name)
         
         if voice_id:
             return await handle_speak(voice_id, arguments)
@@ -271,48 +472,95 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
 
 async def handle_speak(voice_id: str, arguments: dict) -> list[TextContent]:
     """Handle TTS for a specific voice."""
+    global _tts_waiting
     text = arguments.get("text", "")
     
     if not text:
         return [TextContent(type="text", text="❌ Error: Text is empty")]
     
-    logging.info(f"Speaking text: '{text[:50]}...' with voice_id={voice_id}")
+    logging.info("Speaking text: '%s...' with voice_id=%s", text[:50], voice_id)
     
     try:
-        # Step 1: Register voice
-        success, msg = await register_voice(voice_id)
-        if not success:
-            return [TextContent(type="text", text=f"❌ Error: {msg}")]
-        logging.info(f"Voice registration: {msg}")
+        _tts_waiting += 1
+        if _TTS_SEM.locked():
+            logging.info("TTS busy, queued (%s waiting)", _tts_waiting)
+        try:
+            await _TTS_SEM.acquire()
+        finally:
+            _tts_waiting -= 1
         
-        # Step 2: Generate speech
-        payload = {
-            "text": text,
-            "chunk_length": 200,
-            "format": "wav",
-            "mp3_bitrate": 128,
-            "normalize": True,
-            "opus_bitrate": -1000,
-            "reference_id": voice_id
-        }
+        streaming = False
+        try:
+            # Step 1: Resolve the voice reference
+            signature = await get_voice_signature(voice_id)
+            if signature is None:
+                msg = f"Voice file '{voice_id}.wav' not found in voices directory."
+                logging.error(msg)
+                return [TextContent(type="text", text=f"❌ Error: {msg}")]
+        
+            # Step 2: Generate speech
+            payload = {
+                "text": text,
+                "chunk_length": 200,
+                "format": "wav",
+                "mp3_bitrate": 128,
+                "normalize": True,
+                "opus_bitrate": -1000
+            }
+            
+            # Not registered yet: send the reference inline instead of a separate register round-trip
+            inline = _registered_voices.get(voice_id) != signature
+            if inline:
+                payload["references"] = [{
+                    "audio": await get_inline_reference(voice_id, signature[0]),
+                    "text": signature[1]
+                }]
+            else:
+                payload["reference_id"] = voice_id
         
-        logging.info(f"Sending TTS request to {TTS_API_URL}")
+            logging.info("Sending TTS request to %s (inline reference: %s)", TTS_API_URL, inline)
         
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            tts_response = await client.post(TTS_API_URL, json=payload)
+            tts_request = _tts_client.build_request("POST", TTS_API_URL, content=json_dumps_bytes(payload), headers=JSON_HEADERS)
+            tts_response = await _tts_client.send(tts_request, stream=True)
             
+            if inline and tts_response.status_code in (404, 422):
+                # Server doesn't take inline references: fall back to register + reference_id
+                await tts_response.aread()
+                await tts_response.aclose()
+                logging.warning("Inline reference rejected (%s), registering voice first", tts_response.status_code)
+                success, msg = await register_voice(voice_id)
+                if not success:
+                    return [TextContent(type="text", text=f"❌ Error: {msg}")]
+                logging.info("Voice registration: %s", msg)
+                
+                inline = False
+                del payload["references"]
+                payload["reference_id"] = voice_id
+                tts_request = _tts_client.build_request("POST", TTS_API_URL, content=json_dumps_bytes(payload), headers=JSON_HEADERS)
+                tts_response = await _tts_client.send(tts_request, stream=True)
+        
             if tts_response.status_code != 200:
+                await tts_response.aread()
+                await tts_response.aclose()
+                # The server may have lost the reference (e.g. restarted): register again next time
+                _registered_voices.pop(voice_id, None)
                 error_msg = f"TTS API error: {tts_response.status_code} - {tts_response.text}"
                 logging.error(error_msg)
                 return [TextContent(type="text", text=f"❌ {error_msg}")]
             
-            audio_data = tts_response.content
-            logging.info(f"TTS generated successfully: {len(audio_data)} bytes")
+            if inline and voice_id not in _registering:
+                spawn_background(register_voice_background(voice_id))
         
-        # Step 3: Send to audio player (fire and forget)
-        success_msg = f"✅ Audio generated with voice '{voice_id}' and sending to player...\n📝 Text: {text[:100]}{'...' if len(text) > 100 else ''}\n🔊 Audio will play automatically."
+            logging.info("TTS response started, streaming to player")
+            
+            # Step 3: Pipe the audio to the player (fire and forget); the task now owns _TTS_SEM
+            spawn_background(stream_to_player(tts_response, AUDIO_PLAYER_URL))
+            streaming = True
+        finally:
+            if not streaming:
+                _TTS_SEM.release()
         
-        asyncio.create_task(send_to_player(audio_data, AUDIO_PLAYER_URL))
+        success_msg = f"✅ Audio generated with voice '{voice_id}' and sending to player...\n📝 Text: {text[:100]}{'...' if len(text) > 100 else ''}\n🔊 Audio will play automatically."
         
         logging.info(success_msg)
         return [TextContent(type="text", text=success_msg)]
@@ -343,7 +591,7 @@ async def main():
             logging.info("📡 Waiting for client connections...")
             
             init_options = app.create_initialization_options()
-            logging.debug(f"Init options: {init_options}")
+            logging.debug("Init options: %s", init_options)
             
             await app.run(
                 read_stream,
@@ -352,8 +600,19 @@ async def main():
             )
             
     except Exception as e:
-        logging.error(f"Server error: {str(e)}", exc_info=True)
+        logging.error("Server error: %s", e, exc_info=True)
         raise
+    finally:
+        if _BG_TASKS:
+            logging.info("Waiting for %s pending player upload(s)...", len(_BG_TASKS))
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*_BG_TASKS, return_exceptions=True),
+                    timeout=PLAYER_SHUTDOWN_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                logging.warning("Pending player uploads cancelled on shutdown")
+        await asyncio.gather(_tts_client.aclose(), _player_client.aclose())
 
 
 if __name__ == "__main__":
@@ -362,5 +621,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logging.info("Server stopped by user")
     except Exception as e:
-        logging.error(f"Fatal error: {str(e)}", exc_info=True)
+        logging.error("Fatal error: %s", e, exc_info=True)
         sys.exit(1)
\ No newline at end of file
@@ -3,47 +3,165 @@ Fish TTS MCP Server
 Japanese Anime Voice Cloning with Taiga reference
 """
 import asyncio
+import atexit
+import os
 import sys
+import queue
 import time
 import base64
+import itertools
+import json
 from pathlib import Path
 from typing import Any
 import logging
+import logging.handlers
 
 import httpx
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
+try:
+    import orjson  # Optional: faster JSON for the config and request payloads
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack  # Optional: msgpack body carries the reference audio as raw bytes (no base64)
+except ImportError:
+    ormsgpack = None
+
 # Logging configuration
-logging.basicConfig(
-    filename='mcp_server.log',
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+# The event loop only enqueues records; a QueueListener thread does the file/stderr writes
+file_handler = logging.FileHandler('mcp_server.log')
+file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
 
-# Add console handler (output to stderr)
+# Console handler (output to stderr)
 console = logging.StreamHandler(sys.stderr)
 console.setLevel(logging.INFO)
-logging.getLogger().addHandler(console)
+
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, file_handler, console, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logging.getLogger().setLevel(logging.DEBUG)
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
 
 # TTS API configuration
 TTS_API_URL = "http://localhost:8080/v1/tts"
 OUTPUT_DIR = Path("C:/Users/gaterbelt/Downloads/speak_mcp/tts_output")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Output retention: SAVE_TTS_OUTPUT=0 skips writing wavs; TTS_OUTPUT_MAX_AGE_MIN>0 opts in to pruning (default 0 = keep forever)
+SAVE_OUTPUT = os.getenv("SAVE_TTS_OUTPUT", "1") == "1"
+OUTPUT_MAX_AGE_MIN = float(os.getenv("TTS_OUTPUT_MAX_AGE_MIN", "0"))
+OUTPUT_PRUNE_INTERVAL = 600.0
+
+# Output names: speech_<process start ms>_<pid>_<seq>.wav - unique under concurrency and across restarts
+_OUTPUT_PREFIX = f"speech_{int(time.time() * 1000)}_{os.getpid()}"
+_OUTPUT_SEQ = itertools.count()
+
 # Reference audio configuration
 REFERENCE_AUDIO_PATH = Path("C:/Users/gaterbelt/Downloads/speak_mcp/taiga.wav")
 REFERENCE_TEXT = "はぁ～ もうヤダヤダ！ 白目むいてたりしてなかった？ もう ほんっと あのときはどうなるかと思った ゴロゴローって転がって 頭打って スーってなって 失神するって あんな感じなんだね 夢の中みたいな感じ"
 
-logging.info(f"=== Fish TTS MCP Server Starting (Taiga Voice Clone) ===")
-logging.info(f"Output Directory: {OUTPUT_DIR}")
-logging.info(f"TTS API: {TTS_API_URL}")
-logging.info(f"Reference Audio: {REFERENCE_AUDIO_PATH}")
+logging.info("=== Fish TTS MCP Server Starting (Taiga Voice Clone) ===")
+logging.info("Output Directory: %s (save=%s, max age=%s min)", OUTPUT_DIR, SAVE_OUTPUT, OUTPUT_MAX_AGE_MIN)
+logging.info("TTS API: %s", TTS_API_URL)
+logging.info("Reference Audio: %s", REFERENCE_AUDIO_PATH)
+
+
+def json_dumps_bytes(obj) -> bytes:
+    """Serialize a request payload to UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_reference_audio() -> bytes | str | None:
+    """
+    Read the reference audio (None if it can't be read).
+    Raw bytes for a msgpack request body, base64 text for a JSON one.
+    """
+    try:
+        reference_audio_bytes = REFERENCE_AUDIO_PATH.read_bytes()
+    except OSError as e:
+        logging.error("Reference audio not readable: %s (%s)", REFERENCE_AUDIO_PATH, e)
+        return None
+    logging.info("Reference audio loaded: %s bytes", len(reference_audio_bytes))
+    if ormsgpack is not None:
+        return reference_audio_bytes
+    return base64.b64encode(reference_audio_bytes).decode('ascii')
+
+
+def encode_tts_request(payload: dict) -> tuple[bytes, str]:
+    """Serialize a /v1/tts payload -> (body, content type). Fish-TTS accepts msgpack or JSON."""
+    if ormsgpack is not None:
+        return ormsgpack.packb(payload), "application/msgpack"
+    return json_dumps_bytes(payload), "application/json; charset=utf-8"
+
+
+# The reference never changes: load/encode it once (retried from call_tool while missing)
+_REFERENCE_AUDIO = load_reference_audio()
+
+# Static part of every TTS request; call_tool only adds "text" and "references"
+_BASE_PAYLOAD = {
+    "format": "wav",
+    "chunk_length": 200,
+    "normalize": True,
+    "max_new_tokens": 1024,
+    "top_p": 0.8,
+    "repetition_penalty": 1.1,
+    "temperature": 0.8
+}
+
+def prune_output_dir(max_age_sec: float) -> int:
+    """Delete speech_*.wav files older than max_age_sec. Returns the number removed."""
+    cutoff = time.time() - max_age_sec
+    removed = 0
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if not (entry.name.startswith("speech_") and entry.name.endswith(".wav")):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+async def prune_output_loop():
+    """Periodically prune old output files (runs for the lifetime of the server)."""
+    while True:
+        try:
+            removed = await asyncio.to_thread(prune_output_dir, OUTPUT_MAX_AGE_MIN * 60)
+            if removed:
+                logging.info("Pruned %s old output file(s)", removed)
+        except Exception as e:
+            logging.error("Output pruning failed: %s", e, exc_info=True)
+        await asyncio.sleep(OUTPUT_PRUNE_INTERVAL)
+
 
 # Initialize MCP server
 app = Server("fishtts-taiga-server")
 
+# Per-route request timeouts (seconds)
+HTTP_TIMEOUTS = {
+    "tts": 60.0,
+}
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=30.0)
+
+# Shared HTTP client (connection pool + keep-alive for the TTS API)
+_http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUTS["tts"], limits=HTTP_LIMITS)
+
+# The local Fish-TTS server saturates its GPU/CPU on one request; queue callers instead of contending
+TTS_CONCURRENCY = max(1, int(os.getenv("TTS_CONCURRENCY", "1")))
+_TTS_SEM = asyncio.Semaphore(TTS_CONCURRENCY)
+_tts_waiting = 0
+
 
 @app.list_tools()
 async def list_tools() -> list[Tool]:
@@ -67,14 +185,15 @@ async def list_tools() -> list[Tool]:
         )
     ]
     
-    logging.debug(f"Returning {len(tools)} tools")
+    logging.debug("Returning %s tools", len(tools))
     return tools
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Execute tool"""
-    logging.info(f"call_tool() - name: {name}, arguments: {arguments}")
+    global _REFERENCE_AUDIO, _tts_waiting
+    logging.info("call_tool() - name: %s, arguments: %s", name, arguments)
     
     if name != "speak_with_tts":
         error_msg = f"Unknown tool: {name}"
@@ -88,72 +207,88 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         return [TextContent(type="text", text="❌ Error: Text is empty")]
     
     try:
-        # Check if reference audio exists
-        if not REFERENCE_AUDIO_PATH.exists():
+        # Reference audio (cached; retry if it was missing at startup)
+        if _REFERENCE_AUDIO is None:
+            _REFERENCE_AUDIO = await asyncio.to_thread(load_reference_audio)
+        if _REFERENCE_AUDIO is None:
             error_msg = f"Reference audio not found: {REFERENCE_AUDIO_PATH}"
             logging.error(error_msg)
             return [TextContent(type="text", text=f"❌ {error_msg}")]
         
-        # Read reference audio
-        reference_audio_bytes = REFERENCE_AUDIO_PATH.read_bytes()
-        reference_audio_base64 = base64.b64encode(reference_audio_bytes).decode('utf-8')
-        
-        logging.info(f"Reference audio loaded: {len(reference_audio_bytes)} bytes")
-        
         # Generate output file path
-        timestamp = int(time.time() * 1000)
-        output_file = OUTPUT_DIR / f"speech_{timestamp}.wav"
+        output_file = OUTPUT_DIR / f"{_OUTPUT_PREFIX}_{next(_OUTPUT_SEQ):08d}.wav"
         
-        logging.info(f"Processing TTS request - Text: {text}")
-        logging.info(f"Output file: {output_file}")
+        logging.info("Processing TTS request - Text: %s", text)
+        logging.info("Output file: %s", output_file)
         text = "(screaming)" + text
         # TTS API request with voice cloning
-        payload = {
-            "text": text,
-            "references": [
+        payload = dict(
+            _BASE_PAYLOAD,
+            text=text,
+            references=[
                 {
-                    "audio": reference_audio_base64,
+                    "audio": _REFERENCE_AUDIO,
                     "text": REFERENCE_TEXT
                 }
             ],
-            "format": "wav",
-            "chunk_length": 200,
-            "normalize": True,
-            "max_new_tokens": 1024,
-            "top_p": 0.8,
-            "repetition_penalty": 1.1,
-            "temperature": 0.8
-        }
+        )
+        
+        body, content_type = encode_tts_request(payload)
         
-        logging.debug(f"Sending POST request to {TTS_API_URL}")
-        logging.debug(f"Payload keys: {payload.keys()}")
+        logging.debug("Sending POST request to %s", TTS_API_URL)
+        logging.debug("Payload keys: %s (%s, %s bytes)", payload.keys(), content_type, len(body))
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
+        _tts_waiting += 1
+        if _TTS_SEM.locked():
+            logging.info("TTS busy, queued (%s waiting)", _tts_waiting)
+        try:
+            await _TTS_SEM.acquire()
+        finally:
+            _tts_waiting -= 1
+        
+        try:
+            # Stream the wav straight to disk so only one HTTP chunk is held in memory
+            async with _http_client.stream(
+                "POST",
                 TTS_API_URL,
-                json=payload,
+                content=body,
                 headers={
-                    "Content-Type": "application/json; charset=utf-8",
+                    "Content-Type": content_type,
                     "Accept": "audio/wav"
                 }
-            )
-            
-            logging.info(f"TTS API response status: {response.status_code}")
-            
-            if response.status_code != 200:
-                error_msg = f"TTS API error: {response.status_code} - {response.text}"
-                logging.error(error_msg)
-                return [TextContent(type="text", text=f"❌ {error_msg}")]
-            
-            # Save WAV file
-            file_size = len(response.content)
-            output_file.write_bytes(response.content)
-            
-            logging.info(f"File saved successfully - Size: {file_size} bytes")
-            
-            success_msg = f"✅ Speech generated with Taiga voice!\n📁 {output_file.name}\n🎤 Voice: Taiga (Anime Style)\n📝 {text}"
-            return [TextContent(type="text", text=success_msg)]
+            ) as response:
+                logging.info("TTS API response status: %s", response.status_code)
+                
+                if response.status_code != 200:
+                    await response.aread()
+                    error_msg = f"TTS API error: {response.status_code} - {response.text}"
+                    logging.error(error_msg)
+                    return [TextContent(type="text", text=f"❌ {error_msg}")]
+                
+                file_size = 0
+                if SAVE_OUTPUT:
+                    # Save WAV file
+                    out = await asyncio.to_thread(open, output_file, "wb")
+                    try:
+                        with out:
+                            async for chunk in response.aiter_bytes():
+                                file_size += len(chunk)
+                                await asyncio.to_thread(out.write, chunk)
+                    except BaseException:
+                        output_file.unlink(missing_ok=True)
+                        raise
+                    logging.info("File saved successfully - Size: %s bytes", file_size)
+                else:
+                    async for chunk in response.aiter_bytes():
+                        file_size += len(chunk)
+                    logging.info("TTS generated (not saved) - Size: %s bytes", file_size)
+        finally:
+            _TTS_SEM.release()
         
+        saved_as = output_file.name if SAVE_OUTPUT else "(output saving disabled)"
+        success_msg = f"✅ Speech generated with Taiga voice!\n📁 {saved_as}\n🎤 Voice: Taiga (Anime Style)\n📝 {text}"
+        return [TextContent(type="text", text=success_msg)]
+    
     except httpx.TimeoutException as e:
         error_msg = "TTS API timeout (voice cloning may take longer)"
         logging.error(error_msg, exc_info=True)
@@ -169,13 +304,17 @@ async def main():
     """Run MCP server main loop"""
     logging.info("Starting stdio server...")
     
+    prune_task = None
+    if SAVE_OUTPUT and OUTPUT_MAX_AGE_MIN > 0:
+        prune_task = asyncio.create_task(prune_output_loop())
+    
     try:
         async with stdio_server() as (read_stream, write_stream):
             logging.info("Stdio server initialized")
             logging.info("Waiting for client connections...")
             
             init_options = app.create_initialization_options()
-            logging.debug(f"Init options: {init_options}")
+            logging.debug("Init options: %s", init_options)
             
             await app.run(
                 read_stream,
@@ -184,8 +323,12 @@ async def main():
             )
             
     except Exception as e:
-        logging.error(f"Server error: {str(e)}", exc_info=True)
+        logging.error("Server error: %s", e, exc_info=True)
         raise
+    finally:
+        if prune_task is not None:
+            prune_task.cancel()
+        await _http_client.aclose()
 
 
 if __name__ == "__main__":
@@ -194,5 +337,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logging.info("Server stopped by user")
     except Exception as e:
-        logging.error(f"Fatal error: {str(e)}", exc_info=True)
+        logging.error("Fatal error: %s", e, exc_info=True)
         sys.exit(1)
\ No newline at end of file
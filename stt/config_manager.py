@@ -13,7 +13,8 @@ DEFAULT_CONFIG = {
     "cooldown_time": 3.0,
     "overlay_image_path": "love_live.jpg",
     "overlay_duration_ms": 1500,
-    "overlay_sound_file": "wakeword_sound.wav"
+    "overlay_sound_file": "wakeword_sound.wav",
+    "paste_settle": 0.1
 }
 
 class ConfigManager:
@@ -1,11 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
 import threading
 import os
+import math
 from config_manager import ConfigManager
 from wakeword_client import WakeWordClient, STATUS_IDLE, STATUS_LISTENING, STATUS_WAKED, STATUS_RECORDING, STATUS_PROCESSING, STATUS_TYPED
 
+# Status -> (Text, Color, Progress)
+STATUS_STYLES = {
+    STATUS_IDLE: ("Sleeping", "#555555", 0.0),
+    STATUS_LISTENING: ("Listening...", "#4CAF50", 0.2), # Greenish
+    STATUS_WAKED: ("Waked!", "#FFC107", 0.4),       # Amber
+    STATUS_RECORDING: ("Recording...", "#FF5722", 0.6), # Orange
+    STATUS_PROCESSING: ("Processing...", "#2196F3", 0.8), # Blue
+    STATUS_TYPED: ("Typed!", "#9C27B0", 1.0)        # Purple
+}
+
+# 둥근 모서리 1/4원 단위 오프셋 (시작각 -> 점 5개), 폴리곤 좌표 계산 시 재사용
+CORNER_STEPS = 4
+CORNER_OFFSETS = {
+    start: tuple((math.cos(math.radians(start + 90 * i / CORNER_STEPS)),
+                  math.sin(math.radians(start + 90 * i / CORNER_STEPS)))
+                 for i in range(CORNER_STEPS + 1))
+    for start in (-90, 0, 90, 180)
+}
+
 class STTStatusBar:
     def __init__(self, root):
         self.root = root
@@ -25,6 +44,18 @@ class STTStatusBar:
         self.is_running = False
         self.client = None
         self.settings_window = None
+        self.current_status = None
+        
+        # Overlay window is created once and shown/withdrawn; image cached as (path, mtime, PhotoImage)
+        self._overlay_window = None
+        self._overlay_label = None
+        self._overlay_cache = None
+        self._overlay_hide_job = None
+        
+        # Status updates arrive from the client thread; keep only the latest until Tk is idle
+        self._status_lock = threading.Lock()
+        self._pending_status = None
+        self._status_scheduled = False
         
         # Dragging functionality
         self.root.bind('<Button-1>', self.start_move)
@@ -51,7 +82,8 @@ class STTStatusBar:
         # Status Canvas (Custom Visual)
         self.status_canvas = tk.Canvas(main_frame, width=150, height=30, bg='#2b2b2b', highlightthickness=0)
         self.status_canvas.pack(side='left', padx=5)
-        self.draw_status("Sleeping", "#555555", 0.0)
+        self.create_status_items()
+        self.apply_status(STATUS_IDLE)
 
         # Start/Stop Button
         self.toggle_btn = tk.Button(main_frame, text="▶", command=self.toggle_listening, 
@@ -68,36 +100,55 @@ class STTStatusBar:
                                   bg='#d32f2f', fg='white', relief='flat', width=3)
         self.exit_btn.pack(side='right', padx=5)
 
-    def draw_status(self, text, color, progress=1.0):
-        self.status_canvas.delete("all")
+    def create_status_items(self):
+        # One background pill, one fill pill and one text item; statuses only update them in place
         width = 150
         height = 30
         
         # Background Pill
         self.round_rectangle(0, 0, width, height, radius=15, fill="#333333", outline="")
         
-        # Progress Fill
-        fill_width = width * progress
-        if fill_width > 0:
-            self.round_rectangle(0, 0, fill_width, height, radius=15, fill=color, outline="")
+        # Progress Fill (geometry per status precomputed; same point count so coords() just swaps them)
+        self._fill_points = {}
+        for status, (text, color, progress) in STATUS_STYLES.items():
+            fill_width = width * progress
+            if fill_width > 0:
+                self._fill_points[status] = self.round_rectangle_points(0, 0, fill_width, height, radius=15)
+        self._fill_id = self.round_rectangle(0, 0, width, height, radius=15, fill="#333333", outline="", state='hidden')
             
         # Text
-        self.status_canvas.create_text(width/2, height/2, text=text, fill="white", font=("Arial", 10, "bold"))
+        self._text_id = self.status_canvas.create_text(width/2, height/2, text="", fill="white", font=("Arial", 10, "bold"))
+
+    def apply_status(self, status):
+        if status == self.current_status or status not in STATUS_STYLES:
+            return
+        text, color, progress = STATUS_STYLES[status]
+        points = self._fill_points.get(status)
+        if points is None:
+            self.status_canvas.itemconfigure(self._fill_id, state='hidden')
+        else:
+            self.status_canvas.coords(self._fill_id, points)
+            self.status_canvas.itemconfigure(self._fill_id, fill=color, state='normal')
+        self.status_canvas.itemconfigure(self._text_id, text=text)
+        self.current_status = status
+
+    def round_rectangle_points(self, x1, y1, x2, y2, radius=25):
+        # 모서리를 직접 꺾은선으로 근사 (smooth=True 스플라인 분할 비용 없음)
+        radius = min(radius, (x2 - x1) / 2, (y2 - y1) / 2)
+        corners = ((x2 - radius, y1 + radius, -90),   # 우상
+                   (x2 - radius, y2 - radius, 0),     # 우하
+                   (x1 + radius, y2 - radius, 90),    # 좌하
+                   (x1 + radius, y1 + radius, 180))   # 좌상
+        points = []
+        for cx, cy, start in corners:
+            for dx, dy in CORNER_OFFSETS[start]:
+                points.append(cx + radius * dx)
+                points.append(cy + radius * dy)
+        return points
 
     def round_rectangle(self, x1, y1, x2, y2, radius=25, **kwargs):
-        points = [x1+radius, y1,
-                  x2-radius, y1,
-                  x2, y1,
-                  x2, y1+radius,
-                  x2, y2-radius,
-                  x2, y2,
-                  x2-radius, y2,
-                  x1+radius, y2,
-                  x1, y2,
-                  x1, y2-radius,
-                  x1, y1+radius,
-                  x1, y1]
-        return self.status_canvas.create_polygon(points, **kwargs, smooth=True)
+        points = self.round_rectangle_points(x1, y1, x2, y2, radius)
+        return self.status_canvas.create_polygon(points, **kwargs)
 
     def toggle_listening(self):
         if self.is_running:
@@ -111,7 +162,7 @@ class STTStatusBar:
 
         self.is_running = True
         self.toggle_btn.config(text="■", bg='#d32f2f')
-        self.draw_status("Listening...", "#4CAF50", 0.2) # Initial state
+        self.apply_status(STATUS_LISTENING) # Initial state
         
         config = self.config_manager.config
         
@@ -122,6 +173,7 @@ class STTStatusBar:
                 wakeword_threshold=config.get("wakeword_threshold"),
                 overlay_image_path=config.get("overlay_image_path"),
                 overlay_sound_file=config.get("overlay_sound_file"),
+                paste_settle=config.get("paste_settle", 0.1),
                 log_callback=self.log_callback,
                 on_wakeword=self.on_wakeword_detected,
                 status_callback=self.update_status_ui
@@ -139,7 +191,7 @@ class STTStatusBar:
             self.client.run()
         except Exception as e:
             print(f"Client error: {e}")
-            self.root.after(0, self.stop_listening)
+            self.root.after_idle(self.stop_listening)
 
     def stop_listening(self):
         self.is_running = False
@@ -147,67 +199,111 @@ class STTStatusBar:
             self.client.stop()
         
         self.toggle_btn.config(text="▶", bg='#4CAF50')
-        self.draw_status("Sleeping", "#555555", 0.0)
+        self.apply_status(STATUS_IDLE)
 
     def log_callback(self, message):
         # We rely on status_callback for UI updates now, but keep this for debug or fallback
         pass
 
     def update_status_ui(self, status):
-        # Map status to (Text, Color, Progress)
-        status_map = {
-            STATUS_IDLE: ("Sleeping", "#555555", 0.0),
-            STATUS_LISTENING: ("Listening...", "#4CAF50", 0.2), # Greenish
-            STATUS_WAKED: ("Waked!", "#FFC107", 0.4),       # Amber
-            STATUS_RECORDING: ("Recording...", "#FF5722", 0.6), # Orange
-            STATUS_PROCESSING: ("Processing...", "#2196F3", 0.8), # Blue
-            STATUS_TYPED: ("Typed!", "#9C27B0", 1.0)        # Purple
-        }
-        
-        if status in status_map:
-            text, color, progress = status_map[status]
-            self.root.after(0, lambda: self.draw_status(text, color, progress))
+        if status not in STATUS_STYLES:
+            return
+        with self._status_lock:
+            self._pending_status = status
+            if self._on_ui_thread():
+                # Already on the Tk thread (e.g. stop_listening -> client.stop()): apply directly
+                apply_now = True
+            elif self._status_scheduled:
+                return
+            else:
+                apply_now = False
+                self._status_scheduled = True
+        if apply_now:
+            self.apply_status(status)
+        else:
+            self.root.after_idle(self._flush_status)
+
+    def _flush_status(self):
+        with self._status_lock:
+            status = self._pending_status
+            self._status_scheduled = False
+        self.apply_status(status)
+
+    def _on_ui_thread(self):
+        return threading.current_thread() is threading.main_thread()
 
     def on_wakeword_detected(self):
-        # Schedule overlay on main thread
-        self.root.after(0, self.show_overlay)
+        # Schedule overlay on main thread (direct call if we're already there)
+        if self._on_ui_thread():
+            self.show_overlay()
+        else:
+            self.root.after_idle(self.show_overlay)
+
+    def create_overlay_window(self):
+        overlay = tk.Toplevel(self.root)
+        overlay.title("WakeWord Overlay")
+        
+        screen_width = overlay.winfo_screenwidth()
+        screen_height = overlay.winfo_screenheight()
+        
+        overlay.overrideredirect(True)
+        overlay.geometry(f"{screen_width}x{screen_height}+0+0")
+        overlay.attributes('-alpha', 1.0)
+        overlay.attributes('-topmost', True)
+        overlay.config(bg='black')
+        
+        label = tk.Label(overlay, bg='black')
+        label.pack(expand=True)
+        
+        overlay.withdraw()
+        self._overlay_window = overlay
+        self._overlay_label = label
 
     def show_overlay(self):
         config = self.config_manager.config
         image_path = config.get("overlay_image_path")
         duration = config.get("overlay_duration_ms", 1500)
 
-        if not image_path or not os.path.exists(image_path):
+        if not image_path:
+            return
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
             return
 
         try:
-            overlay = tk.Toplevel(self.root)
-            overlay.title("WakeWord Overlay")
-            
-            screen_width = overlay.winfo_screenwidth()
-            screen_height = overlay.winfo_screenheight()
-            
-            overlay.overrideredirect(True)
-            overlay.geometry(f"{screen_width}x{screen_height}+0+0")
-            overlay.attributes('-alpha', 1.0)
-            overlay.attributes('-topmost', True)
-            overlay.config(bg='black')
+            if self._overlay_window is None or not self._overlay_window.winfo_exists():
+                self.create_overlay_window()
+                self._overlay_cache = None
             
-            pil_image = Image.open(image_path)
-            tk_image = ImageTk.PhotoImage(pil_image)
+            # Decode only when the configured image (or the file itself) changed
+            if self._overlay_cache is None or self._overlay_cache[:2] != (image_path, mtime):
+                # Pillow is only needed once a wake word fires; import it here to keep startup light
+                from PIL import Image, ImageTk
+                
+                pil_image = Image.open(image_path)
+                tk_image = ImageTk.PhotoImage(pil_image)
+                self._overlay_label.config(image=tk_image)
+                self._overlay_cache = (image_path, mtime, tk_image) # Keep reference
             
-            label = tk.Label(overlay, image=tk_image, bg='black')
-            label.image = tk_image # Keep reference
-            label.pack(expand=True)
-            
-            overlay.after(duration, overlay.destroy)
+            if self._overlay_hide_job is not None:
+                self._overlay_window.after_cancel(self._overlay_hide_job)
+            self._overlay_window.deiconify()
+            self._overlay_window.lift()
+            self._overlay_hide_job = self._overlay_window.after(duration, self.hide_overlay)
             
         except Exception as e:
             print(f"Overlay error: {e}")
 
+    def hide_overlay(self):
+        self._overlay_hide_job = None
+        if self._overlay_window is not None and self._overlay_window.winfo_exists():
+            self._overlay_window.withdraw()
+
     def open_settings(self):
+        # Built on first open, then withdrawn/re-shown instead of rebuilt
         if self.settings_window and self.settings_window.window.winfo_exists():
-            self.settings_window.window.lift()
+            self.settings_window.show()
             return
             
         self.settings_window = SettingsWindow(self.root, self.config_manager)
@@ -223,10 +319,19 @@ class SettingsWindow:
         self.window.title("Settings")
         self.window.geometry("500x600")
         self.config_manager = config_manager
+        # Closing only hides the window so the next open reuses the widgets
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)
         
         self.create_widgets()
         self.load_settings()
 
+    def show(self):
+        if self.window.state() == 'withdrawn':
+            # Discard any unsaved edits from the last time it was open
+            self.load_settings()
+            self.window.deiconify()
+        self.window.lift()
+
     def create_widgets(self):
         frame = ttk.Frame(self.window, padding="10")
         frame.pack(fill='both', expand=True)
@@ -307,7 +412,7 @@ class SettingsWindow:
         
         self.config_manager.save_config()
         messagebox.showinfo("Success", "Settings saved!")
-        self.window.destroy()
+        self.window.withdraw()
 
     def add_model(self):
         filename = filedialog.askopenfilename(filetypes=[("ONNX files", "*.onnx")])
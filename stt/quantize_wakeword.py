@@ -0,0 +1,29 @@
+"""
+Wake Word ONNX 모델 INT8 양자화 (오프라인 1회 실행)
+
+사용법:
+    python quantize_wakeword.py ruby_chan.onnx
+    -> ruby_chan.int8.onnx 생성, config.json의 wakeword_models에 지정해서 사용
+"""
+import sys
+import os
+
+from onnxruntime.quantization import quantize_dynamic, QuantType
+
+
+def quantize(model_path):
+    root, ext = os.path.splitext(model_path)
+    output_path = f"{root}.int8{ext}"
+    # 가중치만 INT8로 (동적 양자화: 활성값 스케일은 실행 시 계산)
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    print(f"✅ {model_path} -> {output_path} "
+          f"({os.path.getsize(model_path)} -> {os.path.getsize(output_path)} bytes)")
+    return output_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        quantize(path)
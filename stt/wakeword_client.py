@@ -1,17 +1,26 @@
-import openwakeword
-from openwakeword.model import Model
-import pyaudio
+# openwakeword(onnxruntime), pyaudio, pygame는 무거워서 실제 사용 시점에 import
+# (GUI는 상태 상수 때문에 이 모듈을 바로 import하므로 시작이 느려지지 않도록)
 import numpy as np
-from datetime import datetime
+import math
 import time
 import requests
-import io
-import threading
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import os
-import pygame
+import queue
+import threading
 import pyautogui
 import pyperclip
 import wave
+import io
+
+try:
+    import soundfile  # 선택: 녹음을 FLAC(무손실)으로 압축해서 전송
+except ImportError:
+    soundfile = None
+
+CLIPBOARD_TIMEOUT = 0.05  # 클립보드 반영 확인 최대 대기 (초)
+PASTE_SETTLE = 0.1        # 붙여넣기 후 엔터 전 대기 기본값 (초, config의 paste_settle)
 
 # Status Constants
 STATUS_IDLE = "idle"           # Sleeping
@@ -33,6 +42,7 @@ class WakeWordClient:
                  overlay_image_path="overlay.png",
                  overlay_duration_ms=1500,
                  overlay_sound_file=None,
+                 paste_settle=PASTE_SETTLE,
                  log_callback=None,
                  on_wakeword=None,
                  status_callback=None
@@ -54,11 +64,27 @@ class WakeWordClient:
                 self.log(f"⚠️ 모델 파일을 찾을 수 없습니다: {model}")
         
         if not valid_models:
+            # 빈 목록이면 openwakeword가 기본 모델 전체를 불러오므로 여기서 중단
             self.log("❌ 유효한 모델이 없습니다. 기본 모델을 확인해주세요.")
-        
-        self.wakeword_model = Model(wakeword_models=valid_models)
+            raise FileNotFoundError(f"No wake word model found: {wakeword_models}")
         
         self.whisper_server_url = whisper_server_url
+        # Whisper 서버와 keep-alive 연결 재사용 (발화마다 TCP 핸드셰이크 생략)
+        self._http = requests.Session()
+        self._http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._raw_upload = True # /transcribe_raw가 없는 서버면 False로 바뀌고 multipart 사용
+        # 서버 확인(네트워크 대기)은 모델 로딩과 동시에 진행
+        health_thread = threading.Thread(target=self._test_server_connection, daemon=True)
+        health_thread.start()
+        
+        from openwakeword.model import Model
+        # 기본값은 tflite라서 .onnx 모델(양자화본 포함)이면 onnxruntime으로 명시
+        framework = 'tflite' if all(m.endswith('.tflite') for m in valid_models) else 'onnx'
+        # 작은 모델이라 ORT 스레드 1개가 가장 빠르고 오디오/GUI 스레드와 코어 경쟁도 없음
+        # (ncpu는 멜/임베딩 특징 모델 세션의 intra/inter-op 스레드 수로 전달됨)
+        self.wakeword_model = Model(wakeword_models=valid_models, inference_framework=framework, ncpu=1)
+        
         self.wakeword_threshold = wakeword_threshold
         self.max_recording_duration = max_recording_duration
         self.silence_duration = silence_duration
@@ -68,19 +94,49 @@ class WakeWordClient:
         self.overlay_image_path = overlay_image_path
         self.overlay_duration_ms = overlay_duration_ms
         self.overlay_sound_file = overlay_sound_file
+        # 느린 앱은 붙여넣기가 늦게 반영되므로 엔터 전에 기다림 (짧으면 빈/잘린 메시지 전송)
+        self.paste_settle = paste_settle
         
-        self.last_wakeword_time = 0
+        # 쿨다운 계산용 (time.monotonic 기준, 시스템 시계 변경 영향 없음)
+        self.last_wakeword_time = float('-inf')
         self.running = False
         
         # PyAudio 설정
+        import pyaudio
         self.FORMAT = pyaudio.paInt16
+        self._pa_continue = pyaudio.paContinue # 콜백 반환값
         self.CHANNELS = 1
         self.RATE = 16000
         self.CHUNK = 1280
         
         self.audio = None # 초기화 지연
+        self._stream = None # run() 동안 유지되는 입력 스트림 (콜백 모드)
+        # PortAudio 콜백이 채우는 청크 큐 (가득 차면 가장 오래된 청크를 버림)
+        self._audio_q = queue.Queue(maxsize=16)
+        self._side_pool = None # 텍스트 입력용 워커 (run()에서 생성)
+        self._pygame = None # run() 시작 시 import (종료 시 mixer 정리용)
+        self._wake_sound = None # 미리 디코딩해 둔 감지 사운드 (pygame.mixer.Sound)
+        
+        # VAD용 버퍼: int16 제곱을 int32로 (청크마다 float 변환/할당 없음)
+        self._rms_buf = np.empty(self.CHUNK, dtype=np.int32)
+        self._silence_sq = float(self.silence_threshold) ** 2
+        
+        # VAD 루프 상수 (녹음마다 다시 계산하지 않음)
+        chunk_sec = self.CHUNK / self.RATE
+        self._max_silent_chunks = int(self.silence_duration / chunk_sec)
+        self._max_chunks = int(self.max_recording_duration / chunk_sec)
+        # 녹음 버퍼 (최대 길이만큼 한 번만 할당, 청크를 리스트에 모았다 join하지 않음)
+        self._rec_buf = bytearray(self.CHUNK * 2 * self._max_chunks)
+        # 마지막 음성 청크 뒤로 남길 무음 길이 (바이트, 나머지 끝 무음은 전송하지 않음)
+        self._tail_pad_bytes = int(0.3 * self.RATE) * 2
+        # 첫 음성 청크 앞으로 남길 길이 (임계값 아래인 첫 자음이 잘리지 않도록)
+        self._head_pad_bytes = int(0.3 * self.RATE) * 2
+        
+        # 첫 실제 청크가 ONNX 세션 콜드 패스를 타지 않도록 한 번 돌려두고 상태 리셋
+        self.wakeword_model.predict(np.zeros(self.CHUNK, dtype=np.int16))
+        self.wakeword_model.reset()
         
-        self._test_server_connection()
+        health_thread.join()
         self.log("초기화 완료!")
 
     def log(self, message):
@@ -98,7 +154,7 @@ class WakeWordClient:
 
     def _test_server_connection(self):
         try:
-            response = requests.get(f"{self.whisper_server_url}/health", timeout=5)
+            response = self._http.get(f"{self.whisper_server_url}/health", timeout=5)
             if response.status_code == 200:
                 self.log(f"✅ Whisper 서버 연결 성공: {self.whisper_server_url}")
             else:
@@ -110,57 +166,113 @@ class WakeWordClient:
         """텍스트 입력 및 엔터"""
         try:
             pyperclip.copy(text)
+            # 고정 대기 대신 클립보드에 실제로 들어갈 때까지만 짧게 확인
+            deadline = time.monotonic() + CLIPBOARD_TIMEOUT
+            while pyperclip.paste() != text and time.monotonic() < deadline:
+                time.sleep(0.005)
             pyautogui.hotkey('ctrl', 'v')
-            time.sleep(0.1)
+            time.sleep(self.paste_settle)
             pyautogui.press('enter')
             self.log(f"✅ 텍스트 입력 완료: '{text}'")
             self.update_status(STATUS_TYPED)
         except Exception as e:
             self.log(f"❌ 텍스트 입력 에러: {e}")
     
-    def play_sound(self):
+    def _load_wake_sound(self):
+        # mixer 초기화 + 파일 디코딩은 한 번만 (감지할 때마다 장치를 다시 열지 않음)
         if self.overlay_sound_file and os.path.exists(self.overlay_sound_file):
             try:
+                import pygame
+                self._pygame = pygame
                 pygame.mixer.init()
-                pygame.mixer.music.load(self.overlay_sound_file)
-                pygame.mixer.music.play()
+                self._wake_sound = pygame.mixer.Sound(self.overlay_sound_file)
+            except Exception as e:
+                self.log(f"❌ 사운드 에러: {e}")
+
+    def play_sound(self):
+        # Sound.play()는 바로 반환 (재생은 mixer 스레드에서)
+        if self._wake_sound is not None:
+            try:
+                self._wake_sound.play()
             except Exception as e:
                 self.log(f"❌ 사운드 에러: {e}")
 
+    def _sum_squares(self, audio_chunk):
+        audio_array = np.frombuffer(audio_chunk, dtype=np.int16)
+        if audio_array.size > self._rms_buf.size:
+            self._rms_buf = np.empty(audio_array.size, dtype=np.int32)
+        squares = self._rms_buf[:audio_array.size]
+        np.multiply(audio_array, audio_array, out=squares, dtype=np.int32)
+        return int(squares.sum(dtype=np.int64)), audio_array.size
+
+    def _audio_cb(self, in_data, frame_count, time_info, status_flags):
+        # PortAudio 스레드: 큐에 넣기만 하고 바로 반환
+        try:
+            self._audio_q.put_nowait(in_data)
+        except queue.Full:
+            try:
+                self._audio_q.get_nowait()
+            except queue.Empty:
+                pass
+            self._audio_q.put_nowait(in_data)
+        return (None, self._pa_continue)
+
+    def _read_chunk(self):
+        # 청크가 없으면 None (stop() 확인할 수 있도록 타임아웃)
+        try:
+            return self._audio_q.get(timeout=0.5)
+        except queue.Empty:
+            return None
+
+    def _clear_audio_queue(self):
+        while True:
+            try:
+                self._audio_q.get_nowait()
+            except queue.Empty:
+                return
+
     def calculate_rms(self, audio_chunk):
-        audio_array = np.frombuffer(audio_chunk, dtype=np.int16).astype(np.float32)
-        rms = np.sqrt(np.mean(audio_array**2))
-        return rms
+        total, count = self._sum_squares(audio_chunk)
+        return math.sqrt(total / count) if count else 0.0
+
+    def is_voice(self, audio_chunk):
+        # rms > threshold  <=>  sum(x^2) > threshold^2 * n  (sqrt 불필요)
+        total, count = self._sum_squares(audio_chunk)
+        return total > self._silence_sq * count
     
     def record_audio_with_vad(self):
         self.update_status(STATUS_RECORDING)
         self.log(f"🎤 녹음 시작... (최대 {self.max_recording_duration}초)")
         
-        stream = self.audio.open(
-            format=self.FORMAT,
-            channels=self.CHANNELS,
-            rate=self.RATE,
-            input=True,
-            frames_per_buffer=self.CHUNK
-        )
-        
-        frames = []
+        rec_view = memoryview(self._rec_buf)
+        buf_size = len(rec_view)
+        offset = 0
+        voice_start = 0
+        voice_end = 0
         silent_chunks = 0
-        max_silent_chunks = int(self.silence_duration / (self.CHUNK / self.RATE))
-        max_chunks = int(self.max_recording_duration / (self.CHUNK / self.RATE))
+        max_silent_chunks = self._max_silent_chunks
+        
+        # 루프 안에서 속성 조회하지 않도록 로컬 바인딩
+        read_chunk = self._read_chunk
+        is_voice = self.is_voice
         
         recording_started = False
         
-        for i in range(max_chunks):
+        for i in range(self._max_chunks):
             if not self.running: break
-            data = stream.read(self.CHUNK)
-            frames.append(data)
+            data = read_chunk()
+            if data is None: continue
+            end = offset + len(data)
+            if end > buf_size: break
+            rec_view[offset:end] = data
+            offset = end
             
-            rms = self.calculate_rms(data)
-            
-            if rms > self.silence_threshold:
+            if is_voice(data):
                 silent_chunks = 0
+                if not recording_started:
+                    voice_start = offset - len(data)
                 recording_started = True
+                voice_end = end
             else:
                 if recording_started:
                     silent_chunks += 1
@@ -168,21 +280,46 @@ class WakeWordClient:
             if recording_started and silent_chunks >= max_silent_chunks:
                 break
         
-        stream.stop_stream()
-        stream.close()
-        
-        return b''.join(frames)
+        if not recording_started:
+            # 음성이 전혀 없으면 보낼 것도 없음
+            return rec_view[:0]
+        # 말 시작 전 무음과 종료 판정용 끝 무음(silence_duration)은 잘라냄
+        start = max(0, voice_start - self._head_pad_bytes)
+        stop = min(offset, voice_end + self._tail_pad_bytes)
+        # 복사 없이 녹음된 부분의 view 반환 (다음 녹음 전에 전송이 끝나므로 버퍼 재사용 안전)
+        return rec_view[start:stop]
     
     def transcribe_via_server(self, audio_data):
         self.update_status(STATUS_PROCESSING)
         self.log("🔄 Whisper 서버로 전송 중...")
         try:
-            files = {'audio': ('audio.raw', io.BytesIO(audio_data), 'application/octet-stream')}
-            response = requests.post(
-                f"{self.whisper_server_url}/transcribe",
-                files=files,
-                timeout=30
-            )
+            response = None
+            if self._raw_upload:
+                # /transcribe_raw가 있는 서버는 FLAC도 디코딩함 -> 있으면 FLAC(약 1/2~1/3 크기)
+                if soundfile is not None:
+                    flac_buf = io.BytesIO()
+                    soundfile.write(flac_buf, np.frombuffer(audio_data, dtype=np.int16), self.RATE, format='FLAC', subtype='PCM_16')
+                    payload, content_type = flac_buf.getvalue(), 'audio/flac'
+                else:
+                    payload, content_type = bytes(audio_data), 'application/octet-stream'
+                # body에 오디오를 그대로 실어 보냄 (multipart 인코딩/파싱 없음, bytes라 Content-Length가 정해짐)
+                response = self._http.post(
+                    f"{self.whisper_server_url}/transcribe_raw",
+                    data=payload,
+                    headers={'Content-Type': content_type},
+                    timeout=30
+                )
+                if response.status_code == 404:
+                    # 구버전 서버: 이후로는 multipart 엔드포인트 사용
+                    self._raw_upload = False
+                    response = None
+            if response is None:
+                # 구버전 /transcribe는 FLAC을 모르고 raw PCM으로 읽어버림 -> 항상 raw PCM
+                response = self._http.post(
+                    f"{self.whisper_server_url}/transcribe",
+                    files={'audio': ('audio.raw', bytes(audio_data), 'application/octet-stream')},
+                    timeout=30
+                )
             if response.status_code == 200:
                 result = response.json()
                 return result.get('text', '')
@@ -200,47 +337,64 @@ class WakeWordClient:
         self.log("🎧 마이크 리스닝 중...")
         self.log("="*60 + "\n")
         
+        # 웨이크/오디오 스레드를 막지 않도록 부가 작업은 워커에 넘김 (이벤트마다 스레드 생성 X)
+        self._side_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wakeword-side")
+        self._load_wake_sound()
+        
         try:
+            import pyaudio
             self.audio = pyaudio.PyAudio()
+            # 스트림은 한 번만 열고 웨이크워드 감지/녹음에서 계속 재사용 (open은 수백 ms 걸림)
+            self._stream = self.audio.open(
+                format=self.FORMAT,
+                channels=self.CHANNELS,
+                rate=self.RATE,
+                input=True,
+                frames_per_buffer=self.CHUNK,
+                stream_callback=self._audio_cb,
+                start=False
+            )
+            self._clear_audio_queue()
+            self._stream.start_stream()
             
             while self.running:
-                stream = self.audio.open(
-                    format=self.FORMAT,
-                    channels=self.CHANNELS,
-                    rate=self.RATE,
-                    input=True,
-                    frames_per_buffer=self.CHUNK
-                )
-                
                 wakeword_detected = False
                 
+                # 감지 루프 상수 (반복마다 속성 조회하지 않음)
+                threshold = self.wakeword_threshold
+                cooldown_until = self.last_wakeword_time + self.cooldown_time
+                predict = self.wakeword_model.predict
+                read_chunk = self._read_chunk
+                
                 while not wakeword_detected and self.running:
-                    data = stream.read(self.CHUNK, exception_on_overflow=False)
+                    data = read_chunk()
+                    if data is None: continue
                     audio_data = np.frombuffer(data, dtype=np.int16)
                     
-                    # 쿨다운 체크 (루프 시작 시)
-                    if time.time() - self.last_wakeword_time < self.cooldown_time:
-                        continue
+                    # 쿨다운 중이면 추론 생략 (지나면 0으로 두어 이후 청크는 시계 조회도 안 함)
+                    if cooldown_until:
+                        if time.monotonic() < cooldown_until:
+                            continue
+                        cooldown_until = 0.0
 
-                    prediction = self.wakeword_model.predict(audio_data)
+                    prediction = predict(audio_data)
                     
-                    for model_name, score in prediction.items():
-                        if score > self.wakeword_threshold:
-                            self.log(f"✨ Wake Word '{model_name}' 감지! ({score:.3f})")
-                            self.update_status(STATUS_WAKED)
-                            
-                            # 1. 콜백 호출 (GUI 오버레이용)
-                            if self.on_wakeword:
-                                self.on_wakeword()
-                            
-                            # 2. 사운드 재생
-                            threading.Thread(target=self.play_sound, daemon=True).start()
-                            
-                            wakeword_detected = True
-                            break
-                
-                stream.stop_stream()
-                stream.close()
+                    # 미감지(대부분의 청크)는 최고 점수 비교 한 번으로 끝냄, 이름은 감지 시에만 찾음
+                    if max(prediction.values()) <= threshold:
+                        continue
+                    model_name = max(prediction, key=prediction.get)
+                    score = prediction[model_name]
+                    self.log(f"✨ Wake Word '{model_name}' 감지! ({score:.3f})")
+                    self.update_status(STATUS_WAKED)
+                    
+                    # 1. 콜백 호출 (GUI 오버레이용)
+                    if self.on_wakeword:
+                        self.on_wakeword()
+                    
+                    # 2. 사운드 재생
+                    self.play_sound()
+                    
+                    wakeword_detected = True
                 
                 if not self.running: break
 
@@ -249,31 +403,48 @@ class WakeWordClient:
                     self.wakeword_model.reset()
                     
                     audio_data = self.record_audio_with_vad()
-                    text = self.transcribe_via_server(audio_data)
+                    # 전송/쿨다운 동안은 캡처 중지 (오래된 오디오가 버퍼에 남지 않도록)
+                    self._stream.stop_stream()
+                    # 무음뿐이면 서버 왕복 생략
+                    text = self.transcribe_via_server(audio_data) if len(audio_data) else ""
                     
                     if text:
                         self.log(f"📝 인식된 텍스트: '{text}'")
-                        threading.Thread(target=self.type_text_and_enter, args=(text,), daemon=True).start()
+                        self._side_pool.submit(self.type_text_and_enter, text)
                     else:
                         self.log("⚠️  음성이 인식되지 않았습니다.")
                     
                     # 쿨다운 시작 (모든 작업 완료 후)
-                    self.last_wakeword_time = time.time()
+                    self.last_wakeword_time = time.monotonic()
                     self.log(f"쿨다운 시작: {self.cooldown_time}초")
                     time.sleep(self.cooldown_time)
+                    if not self.running: break
+                    self._clear_audio_queue()
+                    self._stream.start_stream()
                     self.update_status(STATUS_LISTENING)
                     self.log("🎧 다시 대기 중...")
                         
         except Exception as e:
             self.log(f"Error in run loop: {e}")
         finally:
+            if self._stream:
+                try:
+                    self._stream.stop_stream()
+                    self._stream.close()
+                except Exception:
+                    pass
+                self._stream = None
             if self.audio:
                 self.audio.terminate()
                 self.audio = None
-            try:
-                pygame.mixer.quit()
-            except:
-                pass
+            self._wake_sound = None
+            if self._pygame is not None:
+                try:
+                    self._pygame.mixer.quit()
+                except:
+                    pass
+            self._http.close()
+            self._side_pool.shutdown(wait=False)
 
 if __name__ == "__main__":
     client = WakeWordClient()
@@ -3,45 +3,71 @@ import pyaudio
 import wave
 import pyautogui
 import pyperclip
-import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
+import time
 
 app = FastAPI()
 
 # 설정
 WAKEWORD_SOUND_PATH = "wakeword_sound.wav"  # Wake Word 감지 시 재생할 사운드 파일
+TIMESTAMP_FORMAT = "%H:%M:%S"  # 로그 출력용 시각 형식
+CLIPBOARD_TIMEOUT = 0.05  # 클립보드 반영 확인 최대 대기 (초)
+PASTE_SETTLE = 0.1        # 붙여넣기 후 엔터 전 대기 (초, 느린 앱에서 엔터가 먼저 가지 않도록)
+
+# 사운드 재생/키보드 매크로용 워커 (요청마다 쓰레드를 만들지 않음)
+worker_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="webhook-worker")
+
+
+# 사운드 재생 상태 (첫 재생 때 준비, 이후 이벤트에서 재사용)
+_audio = None          # PyAudio 인스턴스
+_out_stream = None     # 출력 스트림 (형식이 같으면 계속 재사용)
+_out_format = None     # _out_stream의 (sampwidth, channels, rate)
+_sounds = {}           # 경로 -> ((sampwidth, channels, rate), 전체 프레임 bytes)
+_play_lock = threading.Lock()  # 워커 2개가 같은 스트림에 동시에 쓰지 않도록
+
+
+def _load_sound(wav_file_path):
+    """WAV 파일을 한 번만 읽어서 메모리에 보관"""
+    sound = _sounds.get(wav_file_path)
+    if sound is None:
+        with wave.open(wav_file_path, 'rb') as wf:
+            fmt = (wf.getsampwidth(), wf.getnchannels(), wf.getframerate())
+            sound = (fmt, wf.readframes(wf.getnframes()))
+        _sounds[wav_file_path] = sound
+    return sound
+
+
+def _get_output_stream(fmt):
+    """형식에 맞는 출력 스트림 반환 (_play_lock 안에서 호출)"""
+    global _audio, _out_stream, _out_format
+    if _out_stream is not None and _out_format == fmt:
+        return _out_stream
+    if _audio is None:
+        _audio = pyaudio.PyAudio()
+    if _out_stream is not None:
+        _out_stream.close()
+        _out_stream = None
+    sampwidth, channels, rate = fmt
+    _out_stream = _audio.open(
+        format=_audio.get_format_from_width(sampwidth),
+        channels=channels,
+        rate=rate,
+        output=True
+    )
+    _out_format = fmt
+    return _out_stream
 
 
 def play_sound(wav_file_path):
     """WAV 파일 재생 (별도 쓰레드에서 실행)"""
     try:
-        # WAV 파일 열기
-        wf = wave.open(wav_file_path, 'rb')
-        
-        # PyAudio 인스턴스 생성
-        p = pyaudio.PyAudio()
-        
-        # 스트림 열기
-        stream = p.open(
-            format=p.get_format_from_width(wf.getsampwidth()),
-            channels=wf.getnchannels(),
-            rate=wf.getframerate(),
-            output=True
-        )
+        fmt, frames = _load_sound(wav_file_path)
         
-        # 데이터 읽고 재생
-        chunk = 1024
-        data = wf.readframes(chunk)
-        
-        while data:
-            stream.write(data)
-            data = wf.readframes(chunk)
-        
-        # 정리
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
-        wf.close()
+        # 열려 있는 스트림에 전체 프레임을 한 번에 재생
+        with _play_lock:
+            _get_output_stream(fmt).write(frames)
         
         print(f"✅ 사운드 재생 완료: {wav_file_path}")
         
@@ -57,12 +83,16 @@ def type_text_and_enter(text):
         # 클립보드에 텍스트 복사
         pyperclip.copy(text)
         
+        # 클립보드에 실제로 들어갈 때까지만 짧게 확인 (고정 대기 X)
+        deadline = time.monotonic() + CLIPBOARD_TIMEOUT
+        while pyperclip.paste() != text and time.monotonic() < deadline:
+            time.sleep(0.005)
+        
         # Ctrl+V로 붙여넣기
         pyautogui.hotkey('ctrl', 'v')
         
         # 잠깐 대기 (붙여넣기 완료 대기)
-        import time
-        time.sleep(0.1)
+        time.sleep(PASTE_SETTLE)
         
         # 엔터 누르기
         pyautogui.press('enter')
@@ -79,7 +109,7 @@ async def webhook_handler(request: Request):
     try:
         data = await request.json()
         event_type = data.get("event_type")
-        timestamp = datetime.now().strftime("%H:%M:%S")
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
         
         if event_type == "wakeword_detected":
             # Wake Word 감지 이벤트
@@ -90,10 +120,8 @@ async def webhook_handler(request: Request):
             print(f"   모델: {model_name}")
             print(f"   신뢰도: {confidence:.3f}")
             
-            # 사운드 재생 (별도 쓰레드에서 실행하여 블로킹 방지)
-            thread = threading.Thread(target=play_sound, args=(WAKEWORD_SOUND_PATH,))
-            thread.daemon = True
-            thread.start()
+            # 사운드 재생 (워커에서 실행하여 블로킹 방지)
+            worker_pool.submit(play_sound, WAKEWORD_SOUND_PATH)
             
         elif event_type == "transcription_result":
             # 음성 인식 결과 이벤트
@@ -102,10 +130,8 @@ async def webhook_handler(request: Request):
             print(f"\n[{timestamp}] 📝 음성 인식 결과 수신")
             print(f"   텍스트: '{text}'")
             
-            # 키보드 매크로 실행 (별도 쓰레드)
-            thread = threading.Thread(target=type_text_and_enter, args=(text,))
-            thread.daemon = True
-            thread.start()
+            # 키보드 매크로 실행 (워커)
+            worker_pool.submit(type_text_and_enter, text)
             
         else:
             print(f"\n[{timestamp}] ⚠️  알 수 없는 이벤트 타입: {event_type}")
@@ -1,22 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
 from fastapi.responses import JSONResponse
 from faster_whisper import WhisperModel
+try:
+    from faster_whisper import BatchedInferencePipeline  # faster-whisper >= 1.1
+except ImportError:
+    BatchedInferencePipeline = None
 import numpy as np
 import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import uvicorn
 from pydantic import BaseModel
 
 app = FastAPI(title="Faster-Whisper GPU Server")
 
+PCM_SCALE = np.float32(1.0 / 32768.0)  # int16 PCM -> [-1, 1) float32
+
 # GPU에서 Whisper 모델 로드
 print("🚀 Faster-Whisper 모델 로딩 중... (GPU)")
 whisper_model = WhisperModel(
     "medium",  # tiny, base, small, medium, large
     device="cuda",
-    compute_type="float16"
+    compute_type="int8_float16"  # 가중치 int8 + 연산 fp16 (정확도가 아쉬우면 "float16")
 )
+# VAD로 나눈 구간들을 GPU에서 한 번에 배치 디코딩 (없으면 순차 transcribe)
+BATCH_SIZE = 8
+batched_model = BatchedInferencePipeline(model=whisper_model) if BatchedInferencePipeline else None
 print("✅ 모델 로딩 완료!")
 
+# GPU 추론은 이 워커 하나에서 순서대로 실행 (이벤트 루프는 계속 /health 등 응답)
+gpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-gpu")
+
 
 class TranscriptionResponse(BaseModel):
     text: str
@@ -39,22 +53,51 @@ async def transcribe_audio(audio: UploadFile = File(...)):
     """
     오디오 파일을 받아서 텍스트로 변환
     """
+    # 오디오 데이터 읽기
+    audio_bytes = await audio.read()
+    is_flac = audio.content_type == "audio/flac" or (audio.filename or "").endswith(".flac")
+    return await asyncio.get_running_loop().run_in_executor(gpu_executor, run_transcription, audio_bytes, is_flac)
+
+
+@app.post("/transcribe_raw", response_model=TranscriptionResponse)
+async def transcribe_raw(request: Request):
+    """
+    요청 body 자체를 오디오로 받아서 텍스트로 변환 (multipart 파싱 없음)
+    Content-Type: audio/flac 이면 FLAC, 그 외에는 16kHz 16-bit mono PCM
+    """
+    audio_bytes = await request.body()
+    is_flac = request.headers.get("content-type", "").startswith("audio/flac")
+    return await asyncio.get_running_loop().run_in_executor(gpu_executor, run_transcription, audio_bytes, is_flac)
+
+
+def run_transcription(audio_bytes, is_flac):
     try:
-        # 오디오 데이터 읽기
-        audio_bytes = await audio.read()
-        
-        # bytes를 numpy 배열로 변환 (16-bit PCM -> float32)
-        audio_np = np.frombuffer(audio_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+        if is_flac:
+            # 압축된 업로드: faster-whisper가 디코딩 + 16kHz 리샘플링
+            audio_np = io.BytesIO(audio_bytes)
+        else:
+            # bytes를 numpy 배열로 변환 (16-bit PCM -> float32, 변환+스케일을 한 번에)
+            pcm = np.frombuffer(audio_bytes, dtype=np.int16)
+            audio_np = np.multiply(pcm, PCM_SCALE, dtype=np.float32)
         
         print(f"🎤 오디오 수신: {len(audio_bytes)} bytes")
         
         # Whisper 실행
-        segments, info = whisper_model.transcribe(
-            audio_np,
-            language="ko",
-            beam_size=5,
-            vad_filter=True,
-        )
+        if batched_model is not None:
+            segments, info = batched_model.transcribe(
+                audio_np,
+                language="ko",
+                beam_size=5,
+                vad_filter=True,
+                batch_size=BATCH_SIZE,
+            )
+        else:
+            segments, info = whisper_model.transcribe(
+                audio_np,
+                language="ko",
+                beam_size=5,
+                vad_filter=True,
+            )
         
         # 세그먼트 정보 수집
         segment_list = []